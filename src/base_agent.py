@@ -1,29 +1,180 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from langchain_core.messages import AnyMessage, HumanMessage, AIMessage
-import google.generativeai as genai
-from dotenv import load_dotenv
-import time
+from typing import Callable, List, Dict, Any, Optional
+from langchain_core.messages import AnyMessage
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import contextvars
+import hashlib
+import itertools
 import os
+import threading
+import time
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.logging_utils import AgentLogger, log_tool_execution
+from src.rate_limiter import get_rate_limiter, estimate_tokens
+from src.cache import ResponseCache, get_response_cache
+from src.semantic_cache import get_semantic_cache
+from src.model_backends import ModelBackend, ModelResponse, create_backend
+from src.resilience import ModelCallError, RetryPolicy, call_with_resilience, acall_with_resilience, is_transient_error
+from src.usage_ledger import current_ledger
+from src.prompt_builder import PromptBuilder
+from src.compaction import ConversationCompactor
+from src.plan_stream import JsonPlanStreamParser, PlanStreamParser
+from src.model_routing import get_model_route
+from src.prefix_cache import get_prefix_cache
+from src.tools import READ_ONLY_TOOLS
+from src.structured_output import (STRUCTURED_OUTPUT, TOOL_INPUT_SCHEMAS, answer_instructions,
+                                   build_repair_prompt, json_generation_params, parse_structured,
+                                   plan_schema, validate, validate_plan)
+
+# Stream planning calls and start the chosen tool before REASONING finishes
+STREAM_PLANNING = os.getenv("STREAM_PLANNING", "1") != "0"
+
+_tool_executor: Optional[ThreadPoolExecutor] = None
+_tool_executor_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Shared pool running tools dispatched early from streamed plans."""
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool")
+        return _tool_executor
+
+
+# Concurrent model calls made by BaseAgent.generate_many
+GENERATE_MANY_WORKERS = int(os.getenv("GENERATE_MANY_WORKERS", "4"))
+
+_generation_executor: Optional[ThreadPoolExecutor] = None
+_generation_executor_lock = threading.Lock()
+
+
+def get_generation_executor() -> ThreadPoolExecutor:
+    """Shared pool for the concurrent calls of BaseAgent.generate_many."""
+    global _generation_executor
+    with _generation_executor_lock:
+        if _generation_executor is None:
+            _generation_executor = ThreadPoolExecutor(max_workers=GENERATE_MANY_WORKERS, thread_name_prefix="generate")
+        return _generation_executor
+
+
+# Agent loops of async runs (see BaseAgent.aprocess) running at once; further runs queue for a thread
+AGENT_LOOP_WORKERS = int(os.getenv("AGENT_LOOP_WORKERS", "32"))
+
+_agent_loop_executor: Optional[ThreadPoolExecutor] = None
+_agent_loop_executor_lock = threading.Lock()
+
+
+def get_agent_loop_executor() -> ThreadPoolExecutor:
+    """
+    Pool running the agent loops of async runs.
+    
+    Kept apart from the event loop's default executor: an agent loop blocks
+    on coroutines that may themselves need default-executor threads, so
+    sharing that pool could leave every thread waiting on the others.
+    """
+    global _agent_loop_executor
+    with _agent_loop_executor_lock:
+        if _agent_loop_executor is None:
+            _agent_loop_executor = ThreadPoolExecutor(max_workers=AGENT_LOOP_WORKERS, thread_name_prefix="agent-loop")
+        return _agent_loop_executor
+
+
+# Event loop of the async run whose agent loop this context belongs to (set by BaseAgent.aprocess)
+_run_event_loop: contextvars.ContextVar[Optional[asyncio.AbstractEventLoop]] = contextvars.ContextVar(
+    "run_event_loop", default=None
+)
+
+
+def run_event_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """
+    The event loop model calls should be sent to, or None to call the model synchronously.
+    
+    Set while an agent loop started by aprocess runs on a worker thread; never
+    returned on the loop's own thread, where blocking on it would deadlock.
+    """
+    loop = _run_event_loop.get()
+    if loop is None or loop.is_closed():
+        return None
+    try:
+        if asyncio.get_running_loop() is loop:
+            return None
+    except RuntimeError:
+        pass
+    return loop
+
+
+def run_on_event_loop(loop: asyncio.AbstractEventLoop, coroutine) -> Any:
+    """
+    Run a coroutine on the run's event loop and block this agent-loop thread until it finishes.
+    
+    Only model calls (acomplete_prompt, acall_model) are sent this way. They
+    use the default executor for leaf work that never waits on the loop, so
+    the coroutine can always finish.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
 
-# Load environment variables
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY not found in .env file")
+def off_loop_context() -> contextvars.Context:
+    """
+    Copy of the current context for work the event loop hands to its default executor.
+    
+    Model calls made there run synchronously on that thread instead of being
+    sent back to the loop, so a default-executor thread never blocks on a
+    coroutine that may need another default-executor thread.
+    """
+    ctx = contextvars.copy_context()
+    ctx.run(_run_event_loop.set, None)
+    return ctx
+
+
+class GenerationResult:
+    """Outcome of one prompt in BaseAgent.generate_many: the response text or the error that prevented it."""
+    
+    def __init__(self, text: Optional[str] = None, error: Optional[ModelCallError] = None):
+        self.text = text
+        self.error = error
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+    
+    def result(self) -> str:
+        """Return the text, or raise the error as generate_response would have."""
+        if self.error is not None:
+            raise self.error
+        return self.text
+    
+    def __repr__(self):
+        if self.error is not None:
+            return f"GenerationResult(error={self.error!r})"
+        return f"GenerationResult(text={self.text[:50]!r})"
 
-genai.configure(api_key=api_key)
 
 class BaseAgent(ABC):
     """Abstract base class for all agents in the multi-agent system."""
     
-    def __init__(self, name: str, tools: List, model_name: str = 'gemini-2.0-flash-lite'):
+    def __init__(self, name: str, tools: List, model_name: str = 'gemini-2.0-flash-lite',
+                 backend: Optional[ModelBackend] = None):
         self.name = name
         self.tools = tools
-        self.model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
+        self.backend = backend or create_backend(model_name)
+        # Shared by all agents on this model; local backends are not rate limited
+        self.rate_limiter = get_rate_limiter(model_name) if self.backend.rate_limited else None
+        self.generation_params: Dict[str, Any] = {}  # Passed to the model as generation_config
+        self.retry_policy = RetryPolicy()
+        self.stream_planning = STREAM_PLANNING
+        self.structured_output = STRUCTURED_OUTPUT  # JSON plans and classification answers
+        self.max_actions_per_plan = 1  # Agents with tool loops raise this to batch actions
+        # Incremental, token-bounded history rendering; older history is summarized
+        self.prompt_builder = PromptBuilder(compactor=ConversationCompactor(self.summarize_history))
+        self.response_cache: Optional[ResponseCache] = None  # Falls back to the process-wide cache
+        self.routed_backends: Dict[str, ModelBackend] = {}  # Backends for models routed to by call site
+        self.pending_audits: Dict[str, str] = {}  # Prompt hash -> semantic cache hit being checked against the model
+        self.pending_audits_lock = threading.Lock()
         self.memory = []  # Agent's local memory
         self.logger = None  # Will be set by the graph
         
@@ -46,6 +197,20 @@ class BaseAgent(ABC):
         """Return the system prompt for this agent."""
         pass
     
+    def set_backend(self, backend: ModelBackend):
+        """Swap the model backend used by this agent."""
+        self.backend = backend
+        self.rate_limiter = get_rate_limiter(self.model_name) if backend.rate_limited else None
+        self.routed_backends = {}
+    
+    def get_backend(self, model_name: Optional[str] = None) -> ModelBackend:
+        """Return the backend for a model, creating one on first use for routed models."""
+        if model_name is None or model_name == self.model_name:
+            return self.backend
+        if model_name not in self.routed_backends:
+            self.routed_backends[model_name] = create_backend(model_name)
+        return self.routed_backends[model_name]
+    
     def set_logger(self, logger: AgentLogger):
         """Set the logger for this agent."""
         self.logger = logger
@@ -55,34 +220,588 @@ class BaseAgent(ABC):
         if self.logger:
             self.logger.log(self.name, message, metadata)
     
-    def generate_response(self, messages: List[AnyMessage], additional_prompt: str = "") -> str:
-        """Generate a response using the LLM."""
-        time.sleep(1)
-        system_prompt = self.get_system_prompt()
+    def build_prompt(self, messages: List[AnyMessage], additional_prompt: str = "") -> str:
+        """Combine the system prompt, additional prompt and message history."""
+        return self.prompt_builder.build(self.get_system_prompt(), messages, additional_prompt)
+    
+    def prompt_prefix(self, static_prompt: str = "") -> str:
+        """The static prefix of this agent's prompts (system prompt plus optional static instructions)."""
+        return self.prompt_builder.prefix(self.get_system_prompt(), static_prompt)
+    
+    async def abuild_prompt(self, messages: List[AnyMessage], additional_prompt: str = "") -> str:
+        """Build a prompt off the event loop, since compaction may call the model."""
+        ctx = off_loop_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            None, ctx.run, self.build_prompt, messages, additional_prompt
+        )
+    
+    def summarize_history(self, previous_summary: str, lines: List[str]) -> Optional[str]:
+        """
+        Fold older conversation lines into a rolling summary (used for compaction).
+        
+        Returns:
+            The new summary, or None if the model call failed
+        """
+        summary_prompt = f"""Summarize the conversation history below for an agent continuing this task.
+Keep every concrete fact, figure, decision and completed step; drop repetition and pleasantries.
+Respond with the summary only, in at most 200 words.
+
+Previous summary:
+{previous_summary or "None"}
+
+New messages:
+{"".join(lines)}"""
         
-        # Combine system prompt with message history
-        full_prompt = f"{system_prompt}\n\n"
+        self.log("Generating response", {"prompt_length": len(summary_prompt), "purpose": "compaction"})
+        try:
+            response = self.call_model(summary_prompt)
+        except ModelCallError as e:
+            self.log(f"Error compacting history: {str(e)}", {"error": str(e), "error_type": type(e).__name__})
+            return None
         
-        if additional_prompt:
-            full_prompt += f"{additional_prompt}\n\n"
-            
-        # Add conversation history
-        for msg in messages:
-            if isinstance(msg, HumanMessage):
-                full_prompt += f"Human: {msg.content}\n"
-            elif isinstance(msg, AIMessage):
-                full_prompt += f"Assistant: {msg.content}\n"
+        self.log("Compacted conversation history", {
+            "messages_summarized": len(lines),
+            "summary_length": len(response.text)
+        })
+        return response.text.strip()
+    
+    def get_response_cache(self) -> Optional[ResponseCache]:
+        """Return the response cache this agent should use, if caching is enabled."""
+        if self.response_cache is not None:
+            return self.response_cache
+        return get_response_cache()
+    
+    def request_params(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The agent's generation parameters with any per-call overrides applied."""
+        return dict(self.generation_params, **params) if params else self.generation_params
+    
+    def lookup_cached_response(self, full_prompt: str, model_name: Optional[str] = None,
+                               params: Optional[Dict[str, Any]] = None,
+                               call_site: Optional[str] = None) -> Optional[str]:
+        """
+        Return a cached response for this prompt, if any.
+        
+        The exact response cache is checked first, then the semantic cache for
+        near-duplicate prompts from the same call site (see src.semantic_cache).
+        """
+        model_name = model_name or self.model_name
+        cache = self.get_response_cache()
+        if cache is not None:
+            cached = cache.get(model_name, full_prompt, self.request_params(params))
+            if cached is not None:
+                self.log("Response served from cache", {"prompt_length": len(full_prompt), "response_length": len(cached)})
+                self.record_usage(full_prompt, cached=True, output_text=cached, model_name=model_name)
+                return cached
+        
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is None:
+            return None
+        match = semantic_cache.lookup(model_name, full_prompt, self.request_params(params), call_site)
+        if match is None:
+            return None
+        
+        cached, similarity = match
+        if semantic_cache.should_audit():
+            # Call the model anyway and compare once its response arrives (see store_cached_response)
+            with self.pending_audits_lock:
+                self.pending_audits[self.prompt_key(full_prompt)] = cached
+            self.log("Auditing semantic cache hit", {"similarity": round(similarity, 3), "call_site": call_site})
+            return None
+        
+        self.log("Response served from semantic cache", {
+            "prompt_length": len(full_prompt), "response_length": len(cached),
+            "similarity": round(similarity, 3), "call_site": call_site
+        })
+        self.record_usage(full_prompt, cached=True, output_text=cached, model_name=model_name)
+        self.count_event("semantic_cache_hits")
+        return cached
+    
+    def store_cached_response(self, full_prompt: str, result: str, model_name: Optional[str] = None,
+                              params: Optional[Dict[str, Any]] = None, call_site: Optional[str] = None):
+        """Cache a successful response for this prompt."""
+        model_name = model_name or self.model_name
+        cache = self.get_response_cache()
+        if cache is not None:
+            cache.put(model_name, full_prompt, result, self.request_params(params))
+        
+        semantic_cache = get_semantic_cache()
+        if semantic_cache is not None:
+            with self.pending_audits_lock:
+                audited = self.pending_audits.pop(self.prompt_key(full_prompt), None)
+            if audited is not None:
+                semantic_cache.record_audit(audited, result)
+            semantic_cache.put(model_name, full_prompt, result, self.request_params(params), call_site)
+    
+    @staticmethod
+    def prompt_key(full_prompt: str) -> str:
+        return hashlib.sha256(full_prompt.encode('utf-8')).hexdigest()
+    
+    def log_retry(self, attempt: int, error: BaseException, delay: float):
+        """Log a transient model failure that is about to be retried."""
+        self.log(f"Retrying model call after error: {str(error)}", {
+            "attempt": attempt,
+            "error_type": type(error).__name__,
+            "backoff": round(delay, 2)
+        })
+    
+    def record_usage(self, full_prompt: str, response: Optional[ModelResponse] = None, latency: float = 0.0,
+                     queue_wait: float = 0.0, attempts: int = 0, cached: bool = False,
+                     error: Optional[BaseException] = None, output_text: str = "",
+                     model_name: Optional[str] = None):
+        """Record a model call in the current run's usage ledger, if there is one."""
+        ledger = current_ledger()
+        if ledger is None:
+            return
+        
+        # Prefer the counts the backend reported; estimate when it reported none
+        input_tokens = response.input_tokens if response else None
+        output_tokens = response.output_tokens if response else None
+        output_text = response.text if response else output_text
+        cached_input_tokens = response.cached_tokens if response else 0
+        if input_tokens is None:
+            input_tokens = estimate_tokens(full_prompt) - cached_input_tokens
+        if output_tokens is None:
+            output_tokens = estimate_tokens(output_text) if output_text else 0
+        
+        ledger.record(
+            agent=self.name,
+            model=model_name or self.model_name,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            latency=latency,
+            queue_wait=queue_wait,
+            attempts=attempts,
+            cached=cached,
+            error=type(error).__name__ if error else None,
+            cached_input_tokens=cached_input_tokens
+        )
+    
+    def record_rate_limit_wait(self, stats: Dict[str, Any], waited: float):
+        """Add a rate-limit wait to a call's queue time and log it."""
+        stats["queue_wait"] += waited
+        if waited > 0:
+            self.log("Waited for rate limit", {"rate_limit_wait": round(waited, 2)})
+    
+    def get_model_rate_limiter(self, model_name: Optional[str] = None):
+        """Return the rate limiter for a model's calls, or None if its backend is not rate limited."""
+        if model_name is None or model_name == self.model_name:
+            return self.rate_limiter
+        return get_rate_limiter(model_name) if self.get_backend(model_name).rate_limited else None
+    
+    def get_prefix_handle(self, backend: ModelBackend, full_prompt: str, prefix: str) -> Optional[Any]:
+        """Return the provider handle for a prompt's cached static prefix, if it can be used."""
+        cache = get_prefix_cache()
+        if cache is None or not prefix or not full_prompt.startswith(prefix):
+            return None
+        return cache.get_handle(backend, prefix)
+    
+    def drop_prefix_handle(self, backend: ModelBackend, prefix: str, error: BaseException):
+        """Forget a cached prefix the provider rejected; the caller resends the full prompt."""
+        cache = get_prefix_cache()
+        if cache is not None:
+            cache.invalidate(backend, prefix)
+        self.log(f"Cached prefix rejected, sending full prompt: {str(error)}", {"error_type": type(error).__name__})
+    
+    def call_model(self, full_prompt: str, model_name: Optional[str] = None, prefix: str = "",
+                   params: Optional[Dict[str, Any]] = None) -> ModelResponse:
+        """
+        Send a prompt to the backend with rate limiting, retries, circuit breaking and a deadline.
+        
+        Args:
+            full_prompt: Complete prompt text
+            model_name: Model to call instead of the agent's own (see generate_routed)
+            prefix: Static start of full_prompt to serve from the provider's prefix cache
+            params: Generation parameters overriding the agent's for this call
+        """
+        loop = run_event_loop()
+        if loop is not None:
+            return run_on_event_loop(loop, self.acall_model(full_prompt, model_name, prefix, params))
+        
+        params = self.request_params(params)
+        model_name = model_name or self.model_name
+        backend = self.get_backend(model_name)
+        rate_limiter = self.get_model_rate_limiter(model_name)
+        stats = {"queue_wait": 0.0, "attempts": 0}
+        cached_prefix = {"handle": self.get_prefix_handle(backend, full_prompt, prefix)}
+        
+        def acquire():
+            self.record_rate_limit_wait(stats, rate_limiter.acquire(estimate_tokens(full_prompt)))
         
-        self.log("Generating response", {"prompt_length": len(full_prompt)})
+        def attempt(timeout: Optional[float]) -> ModelResponse:
+            stats["attempts"] += 1
+            if cached_prefix["handle"] is not None:
+                try:
+                    return backend.generate_cached(cached_prefix["handle"], full_prompt[len(prefix):],
+                                                   params, timeout=timeout)
+                except Exception as e:
+                    if is_transient_error(e):
+                        raise
+                    self.drop_prefix_handle(backend, prefix, e)
+                    cached_prefix["handle"] = None
+            return backend.generate(full_prompt, params, timeout=timeout)
         
+        start = time.perf_counter()
         try:
-            response = self.model.generate_content(full_prompt)
-            result = response.text.strip()
-            self.log("Response generated", {"response_length": len(result)})
-            return result
-        except Exception as e:
-            self.log(f"Error generating response: {str(e)}", {"error": str(e)})
-            return f"Error generating response: {str(e)}"
+            response = call_with_resilience(attempt, model_name, self.retry_policy, on_retry=self.log_retry,
+                                            acquire=acquire if rate_limiter else None)
+        except ModelCallError as e:
+            self.record_usage(full_prompt, latency=time.perf_counter() - start - stats["queue_wait"],
+                              queue_wait=stats["queue_wait"], attempts=stats["attempts"], error=e,
+                              model_name=model_name)
+            raise
+        
+        self.record_usage(full_prompt, response, latency=time.perf_counter() - start - stats["queue_wait"],
+                          queue_wait=stats["queue_wait"], attempts=stats["attempts"], model_name=model_name)
+        return response
+    
+    async def acall_model(self, full_prompt: str, model_name: Optional[str] = None, prefix: str = "",
+                          params: Optional[Dict[str, Any]] = None) -> ModelResponse:
+        """Async counterpart of call_model."""
+        params = self.request_params(params)
+        model_name = model_name or self.model_name
+        backend = self.get_backend(model_name)
+        rate_limiter = self.get_model_rate_limiter(model_name)
+        stats = {"queue_wait": 0.0, "attempts": 0}
+        # Registering a prefix is a blocking provider call, so keep it off the event loop
+        handle = await asyncio.get_running_loop().run_in_executor(
+            None, self.get_prefix_handle, backend, full_prompt, prefix
+        )
+        cached_prefix = {"handle": handle}
+        
+        async def acquire():
+            self.record_rate_limit_wait(stats, await rate_limiter.aacquire(estimate_tokens(full_prompt)))
+        
+        async def attempt(timeout: Optional[float]) -> ModelResponse:
+            stats["attempts"] += 1
+            if cached_prefix["handle"] is not None:
+                try:
+                    return await backend.agenerate_cached(cached_prefix["handle"], full_prompt[len(prefix):],
+                                                          params, timeout=timeout)
+                except Exception as e:
+                    if is_transient_error(e):
+                        raise
+                    self.drop_prefix_handle(backend, prefix, e)
+                    cached_prefix["handle"] = None
+            return await backend.agenerate(full_prompt, params, timeout=timeout)
+        
+        start = time.perf_counter()
+        try:
+            response = await acall_with_resilience(attempt, model_name, self.retry_policy, on_retry=self.log_retry,
+                                                   acquire=acquire if rate_limiter else None)
+        except ModelCallError as e:
+            self.record_usage(full_prompt, latency=time.perf_counter() - start - stats["queue_wait"],
+                              queue_wait=stats["queue_wait"], attempts=stats["attempts"], error=e,
+                              model_name=model_name)
+            raise
+        
+        self.record_usage(full_prompt, response, latency=time.perf_counter() - start - stats["queue_wait"],
+                          queue_wait=stats["queue_wait"], attempts=stats["attempts"], model_name=model_name)
+        return response
+    
+    def call_model_stream(self, full_prompt: str, on_chunk, prefix: str = "",
+                          params: Optional[Dict[str, Any]] = None) -> ModelResponse:
+        """
+        Stream a prompt through the backend, passing each chunk to on_chunk as it arrives.
+        
+        Rate limiting, retries, circuit breaking, the deadline and prefix caching
+        apply as in call_model. on_chunk receives the attempt number with each chunk
+        so callers can reset partial state when a failed stream is retried.
+        """
+        params = self.request_params(params)
+        stats = {"queue_wait": 0.0, "attempts": 0}
+        cached_prefix = {"handle": self.get_prefix_handle(self.backend, full_prompt, prefix)}
+        
+        def open_stream():
+            if cached_prefix["handle"] is not None:
+                try:
+                    stream = iter(self.backend.stream_cached(cached_prefix["handle"], full_prompt[len(prefix):],
+                                                             params))
+                    first = next(stream, None)
+                    return ([first] if first is not None else []), stream, estimate_tokens(prefix)
+                except Exception as e:
+                    if is_transient_error(e):
+                        raise
+                    self.drop_prefix_handle(self.backend, prefix, e)
+                    cached_prefix["handle"] = None
+            return [], iter(self.backend.stream(full_prompt, params)), 0
+        
+        def acquire():
+            self.record_rate_limit_wait(stats, self.rate_limiter.acquire(estimate_tokens(full_prompt)))
+        
+        def attempt(timeout: Optional[float]) -> ModelResponse:
+            stats["attempts"] += 1
+            deadline_at = time.monotonic() + timeout if timeout is not None else None
+            chunks = []
+            first_chunks, stream, cached_tokens = open_stream()
+            for chunk in itertools.chain(first_chunks, stream):
+                if deadline_at is not None and time.monotonic() > deadline_at:
+                    raise TimeoutError(f"Stream exceeded {timeout:.2f}s")
+                chunks.append(chunk)
+                on_chunk(stats["attempts"], chunk)
+            return ModelResponse("".join(chunks), cached_tokens=cached_tokens)
+        
+        start = time.perf_counter()
+        try:
+            response = call_with_resilience(attempt, self.model_name, self.retry_policy, on_retry=self.log_retry,
+                                            acquire=acquire if self.rate_limiter else None)
+        except ModelCallError as e:
+            self.record_usage(full_prompt, latency=time.perf_counter() - start - stats["queue_wait"],
+                              queue_wait=stats["queue_wait"], attempts=stats["attempts"], error=e)
+            raise
+        
+        self.record_usage(full_prompt, response, latency=time.perf_counter() - start - stats["queue_wait"],
+                          queue_wait=stats["queue_wait"], attempts=stats["attempts"])
+        return response
+    
+    def generate_response(self, messages: List[AnyMessage], additional_prompt: str = "",
+                          model_name: Optional[str] = None, static_prompt: str = "",
+                          params: Optional[Dict[str, Any]] = None, call_site: Optional[str] = None) -> str:
+        """
+        Generate a response using the LLM.
+        
+        The system prompt, plus static_prompt when additional_prompt starts with it,
+        is sent as a cached prefix where the backend supports it (see src.prefix_cache).
+        
+        Args:
+            messages: Conversation history
+            additional_prompt: Instructions appended after the system prompt
+            model_name: Model to call instead of the agent's own
+            static_prompt: Unchanging leading part of additional_prompt
+            params: Generation parameters overriding the agent's for this call
+            call_site: Name of the calling method, used to scope or skip the semantic cache
+        
+        Raises:
+            ModelCallError: If the model could not produce a response (see src.resilience)
+        """
+        full_prompt = self.build_prompt(messages, additional_prompt)
+        prefix = self.prompt_prefix(static_prompt)
+        loop = run_event_loop()
+        if loop is not None:
+            return run_on_event_loop(loop, self.acomplete_prompt(full_prompt, model_name, prefix, params, call_site))
+        return self.complete_prompt(full_prompt, model_name, prefix, params, call_site)
+    
+    def complete_prompt(self, full_prompt: str, model_name: Optional[str] = None, prefix: str = "",
+                        params: Optional[Dict[str, Any]] = None, call_site: Optional[str] = None) -> str:
+        """
+        Generate a response for an already built prompt, going through the response cache.
+        
+        Raises:
+            ModelCallError: If the model could not produce a response (see src.resilience)
+        """
+        cached = self.lookup_cached_response(full_prompt, model_name, params, call_site)
+        if cached is not None:
+            return cached
+        
+        self.log("Generating response", {"prompt_length": len(full_prompt), "model": model_name or self.model_name})
+        
+        try:
+            response = self.call_model(full_prompt, model_name, prefix=prefix, params=params)
+        except ModelCallError as e:
+            self.log(f"Error generating response: {str(e)}", {"error": str(e), "error_type": type(e).__name__})
+            raise
+        
+        result = response.text.strip()
+        self.log("Response generated", {
+            "response_length": len(result),
+            "input_tokens": response.input_tokens,
+            "output_tokens": response.output_tokens
+        })
+        self.store_cached_response(full_prompt, result, model_name, params, call_site)
+        return result
+    
+    async def agenerate_response(self, messages: List[AnyMessage], additional_prompt: str = "",
+                                 model_name: Optional[str] = None, static_prompt: str = "",
+                                 params: Optional[Dict[str, Any]] = None, call_site: Optional[str] = None) -> str:
+        """
+        Generate a response using the LLM without blocking the event loop.
+        
+        Raises:
+            ModelCallError: If the model could not produce a response (see src.resilience)
+        """
+        full_prompt = await self.abuild_prompt(messages, additional_prompt)
+        return await self.acomplete_prompt(full_prompt, model_name, self.prompt_prefix(static_prompt),
+                                           params, call_site)
+    
+    async def acomplete_prompt(self, full_prompt: str, model_name: Optional[str] = None, prefix: str = "",
+                               params: Optional[Dict[str, Any]] = None, call_site: Optional[str] = None) -> str:
+        """Async counterpart of complete_prompt."""
+        cached = self.lookup_cached_response(full_prompt, model_name, params, call_site)
+        if cached is not None:
+            return cached
+        
+        self.log("Generating response", {"prompt_length": len(full_prompt), "model": model_name or self.model_name})
+        
+        try:
+            response = await self.acall_model(full_prompt, model_name, prefix=prefix, params=params)
+        except ModelCallError as e:
+            self.log(f"Error generating response: {str(e)}", {"error": str(e), "error_type": type(e).__name__})
+            raise
+        
+        result = response.text.strip()
+        self.log("Response generated", {
+            "response_length": len(result),
+            "input_tokens": response.input_tokens,
+            "output_tokens": response.output_tokens
+        })
+        self.store_cached_response(full_prompt, result, model_name, params, call_site)
+        return result
+    
+    def generate_many(self, prompts: List[str], messages: Optional[List[AnyMessage]] = None,
+                      model_name: Optional[str] = None) -> List[GenerationResult]:
+        """
+        Generate responses for several independent prompts concurrently.
+        
+        Only use this for prompts that do not depend on each other's answers. All
+        prompts are built on the calling thread, then sent on a shared pool of
+        GENERATE_MANY_WORKERS threads; rate limiting, retries and the response
+        cache apply to each call as in generate_response.
+        
+        Args:
+            prompts: Additional prompts, one per call
+            messages: Conversation history shared by every call
+            model_name: Model to call instead of the agent's own
+        
+        Returns:
+            One GenerationResult per prompt, in the order given. A failed call
+            sets that result's error and does not affect the others.
+        """
+        messages = messages or []
+        prefix = self.prompt_prefix()
+        full_prompts = [self.build_prompt(messages, prompt) for prompt in prompts]
+        loop = run_event_loop()
+        if loop is not None:
+            return run_on_event_loop(loop, self.acomplete_many(full_prompts, model_name, prefix))
+        
+        def run(full_prompt: str) -> GenerationResult:
+            try:
+                return GenerationResult(text=self.complete_prompt(full_prompt, model_name, prefix))
+            except ModelCallError as e:
+                return GenerationResult(error=e)
+        
+        if len(full_prompts) <= 1:
+            return [run(full_prompt) for full_prompt in full_prompts]
+        
+        self.log(f"Generating {len(full_prompts)} responses concurrently", {"model": model_name or self.model_name})
+        futures = [get_generation_executor().submit(contextvars.copy_context().run, run, full_prompt)
+                   for full_prompt in full_prompts]
+        return [future.result() for future in futures]
+    
+    async def agenerate_many(self, prompts: List[str], messages: Optional[List[AnyMessage]] = None,
+                             model_name: Optional[str] = None) -> List[GenerationResult]:
+        """Async counterpart of generate_many; the calls run concurrently on the event loop."""
+        messages = messages or []
+        prefix = self.prompt_prefix()
+        full_prompts = [await self.abuild_prompt(messages, prompt) for prompt in prompts]
+        return await self.acomplete_many(full_prompts, model_name, prefix)
+    
+    async def acomplete_many(self, full_prompts: List[str], model_name: Optional[str] = None,
+                             prefix: str = "") -> List[GenerationResult]:
+        """Complete several already built prompts concurrently on the event loop."""
+        async def run(full_prompt: str) -> GenerationResult:
+            try:
+                return GenerationResult(text=await self.acomplete_prompt(full_prompt, model_name, prefix))
+            except ModelCallError as e:
+                return GenerationResult(error=e)
+        
+        return list(await asyncio.gather(*(run(full_prompt) for full_prompt in full_prompts)))
+    
+    def generate_routed(self, call_site: str, messages: List[AnyMessage], additional_prompt: str,
+                        is_valid: Callable[[str], bool], schema: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Generate a response on the model configured for a call site (see src.model_routing).
+        
+        Short classification prompts are routed to a small, fast model. If that model
+        fails or its answer does not pass is_valid, the call is repeated on the
+        agent's own model.
+        
+        Args:
+            call_site: Routing key, by convention the calling method's name
+            messages: Conversation history
+            additional_prompt: The classification prompt
+            is_valid: Returns True if an answer can be parsed by the caller
+            schema: With structured output on, the answer is requested as JSON matching this
+                answer_schema (see src.structured_output) and its "answer" value is returned
+        """
+        params = None
+        if schema is not None and self.structured_output:
+            additional_prompt += answer_instructions(schema)
+            params = json_generation_params(schema)
+        
+        def generate(model_name: Optional[str] = None) -> str:
+            response = self.generate_response(messages, additional_prompt, model_name=model_name, params=params,
+                                              call_site=call_site)
+            if params is None:
+                return response
+            value = self.parse_structured_response(response, schema, call_site)
+            # Unrepairable answers are passed on as text for the caller's own lenient parsing
+            return str(value["answer"]) if value is not None else response
+        
+        routed_model = get_model_route(call_site, self.model_name)
+        if routed_model:
+            try:
+                response = generate(routed_model)
+                if is_valid(response):
+                    return response
+                self.log(f"Unparseable answer from {routed_model} for {call_site}; falling back to {self.model_name}",
+                         {"response": response[:200]})
+            except ModelCallError as e:
+                self.log(f"Routed call to {routed_model} failed for {call_site}; falling back to {self.model_name}",
+                         {"error": str(e), "error_type": type(e).__name__})
+        return generate()
+    
+    def count_event(self, event: str, metadata: Optional[dict] = None):
+        """Count an event (e.g. a parse failure) in the current run's usage ledger and log it."""
+        ledger = current_ledger()
+        if ledger is not None:
+            ledger.count(event)
+        self.log(f"Event: {event}", metadata)
+    
+    def parse_structured_response(self, response: str, schema: Dict[str, Any], call_site: str,
+                                  validator: Optional[Callable[[Any], List[str]]] = None) -> Optional[Any]:
+        """
+        Parse a JSON response, giving the model one cheap chance to repair it.
+        
+        Invalid responses are sent once, with the validation errors, to the model routed
+        for 'repair_structured_output' (the small model by default). Parse failures, repairs
+        and unrepairable responses are counted in the usage ledger.
+        
+        Args:
+            response: Model output
+            schema: JSON schema the output must match
+            call_site: Name of the calling method, for logging
+            validator: Replaces schema validation (e.g. validate_plan); returns error messages
+        
+        Returns:
+            The parsed value, or None if it is still invalid after the repair pass
+        """
+        validator = validator or (lambda value: validate(value, schema))
+        
+        def check(text: str):
+            value, errors = parse_structured(text, {})
+            if not errors:
+                errors = validator(value)
+            return (None, errors) if errors else (value, [])
+        
+        value, errors = check(response)
+        if not errors:
+            return value
+        
+        self.count_event("structured_parse_errors", {"call_site": call_site, "errors": errors[:5]})
+        repair_model = get_model_route('repair_structured_output', self.model_name)
+        try:
+            repaired = self.complete_prompt(build_repair_prompt(response, schema, errors),
+                                            repair_model, params=json_generation_params(schema),
+                                            call_site='repair_structured_output')
+        except ModelCallError as e:
+            self.log(f"Repair call failed for {call_site}", {"error": str(e), "error_type": type(e).__name__})
+            repaired = ""
+        
+        value, errors = check(repaired)
+        if errors:
+            self.count_event("structured_parse_failures", {"call_site": call_site, "errors": errors[:5]})
+            return None
+        self.count_event("structured_repairs", {"call_site": call_site})
+        return value
     
     def execute_tool(self, tool_name: str, tool_input: str) -> str:
         """Execute a tool by name with given input."""
@@ -103,18 +822,46 @@ class BaseAgent(ABC):
             self.log(error_msg, {"error": str(e)})
             return error_msg
     
-    def plan_next_action(self, messages: List[AnyMessage], context: Optional[str] = None) -> Dict[str, str]:
-        """Plan the next action based on current state."""
+    def dispatch_tool(self, tool_name: str, tool_input: str, after: Optional[Future] = None) -> Future:
+        """
+        Start a tool on the shared tool pool and return its future.
+        
+        If after is given the tool waits for that earlier dispatch to finish,
+        so the steps of a batched plan still run in order.
+        """
+        ctx = contextvars.copy_context()
+        self.log(f"Dispatched {tool_name} while planning", {"tool": tool_name, "input": tool_input})
+        
+        def run() -> str:
+            if after is not None:
+                after.result()
+            return ctx.run(self.execute_tool, tool_name, tool_input)
+        
+        return get_tool_executor().submit(run)
+    
+    def execute_action(self, action_plan: Dict[str, Any]) -> str:
+        """Execute a planned tool action, reusing the result of an early dispatch if there was one."""
+        dispatched = action_plan.get('dispatched')
+        if dispatched is not None:
+            return dispatched.result()
+        return self.execute_tool(action_plan['action'], action_plan['input'])
+    
+    def planning_params(self) -> Optional[Dict[str, Any]]:
+        """Generation params for planning calls: JSON constrained to the plan schema when structured output is on."""
+        if not self.structured_output:
+            return None
+        return json_generation_params(plan_schema([tool.name for tool in self.tools], self.max_actions_per_plan))
+    
+    def build_planning_template(self) -> str:
+        """Static part of the planning prompt (tools, instructions, format); sent as a cached prefix."""
         # Get tool descriptions
         tool_descriptions = []
         for tool in self.tools:
             tool_descriptions.append(f"- {tool.name}: {tool.description if hasattr(tool, 'description') else 'Available tool'}")
         
-        planning_prompt = f"""Based on the conversation and your role as {self.name}, 
+        return f"""Based on the conversation and your role as {self.name}, 
         decide what action to take next.
         
-        Current context: {context or 'Processing task'}
-        
         Available tools: {chr(10).join(tool_descriptions)}
         
         You can also choose 'respond' to provide a direct response without using tools.
@@ -124,29 +871,191 @@ class BaseAgent(ABC):
         2. Which tool would be most appropriate?
         3. What specific input should be provided to the tool?
         
-        Respond in EXACTLY this format:
+        {self.build_format_instructions()}{self.build_batch_instructions()}"""
+    
+    def build_planning_prompt(self, context: Optional[str] = None) -> str:
+        """Build the prompt asking the agent to choose its next action: static template first, then context."""
+        return f"""{self.build_planning_template()}
+        
+        Current context: {context or 'Processing task'}"""
+    
+    def build_format_instructions(self) -> str:
+        """How the planning response must be formatted: JSON with structured output on, else labelled lines."""
+        if self.structured_output:
+            return f"""Respond with ONLY a JSON object in this shape (no other text):
+        {{"actions": [{{"action": "<exact tool name or 'respond'>", "input": "<tool input or response text>"}}], "reasoning": "<brief explanation of why>"}}
+        Follow each tool's input format exactly (e.g. 'key::value' for save_to_memory)."""
+        return """Respond in EXACTLY this format:
         ACTION: [exact tool name or 'respond']
         INPUT: [tool input or response text]
         REASONING: [brief explanation of why this action]"""
+    
+    def build_batch_instructions(self) -> str:
+        """Extra planning instructions allowing several actions per plan, if this agent batches."""
+        if self.max_actions_per_plan <= 1:
+            return ""
+        if self.structured_output:
+            return f"""
         
-        response = self.generate_response(messages, planning_prompt)
+        You may plan up to {self.max_actions_per_plan} actions at once; they run in order before you plan again.
+        Batch independent steps (e.g. several web_search queries, then save_to_memory calls) by listing
+        one object per step in "actions"."""
+        return f"""
         
-        # Parse response with better error handling
-        lines = response.split('\n')
+        You may plan up to {self.max_actions_per_plan} actions at once; they run in order before you plan again.
+        Batch independent steps (e.g. several web_search queries, then save_to_memory calls) by repeating
+        the ACTION and INPUT lines once per step, then give a single REASONING line for the batch."""
+    
+    def parse_action_plan(self, response: str) -> Dict[str, Any]:
+        """
+        Parse a planning response: JSON with structured output on, else ACTION/INPUT/REASONING lines.
+        
+        The ordered steps (at most max_actions_per_plan) are returned under
+        'actions', each carrying the plan's reasoning; 'action' and 'input' mirror
+        the first step. JSON plans are validated against the tools' input schemas
+        and repaired once if invalid; a plan that still cannot be read is parsed
+        as lines.
+        """
         result = {'action': 'respond', 'input': '', 'reasoning': ''}
+        steps = []
+        
+        if self.structured_output:
+            tool_names = [tool.name for tool in self.tools]
+            plan = self.parse_structured_response(
+                response, plan_schema(tool_names, self.max_actions_per_plan), 'plan_next_action',
+                validator=lambda value: validate_plan(value, tool_names, self.max_actions_per_plan)
+            )
+            if plan is not None:
+                steps = [{'action': step['action'].strip(), 'input': step['input'].strip()} for step in plan['actions']]
+                result['reasoning'] = plan['reasoning'].strip()
+        
+        if not steps:
+            for line in response.split('\n'):
+                line = line.strip()
+                if line.startswith('ACTION:'):
+                    steps.append({'action': line.replace('ACTION:', '').strip(), 'input': ''})
+                elif line.startswith('INPUT:'):
+                    if not steps:
+                        steps.append({'action': 'respond', 'input': ''})
+                    steps[-1]['input'] = line.replace('INPUT:', '').strip()
+                elif line.startswith('REASONING:'):
+                    result['reasoning'] = line.replace('REASONING:', '').strip()
         
-        for line in lines:
-            line = line.strip()
-            if line.startswith('ACTION:'):
-                result['action'] = line.replace('ACTION:', '').strip()
-            elif line.startswith('INPUT:'):
-                result['input'] = line.replace('INPUT:', '').strip()
-            elif line.startswith('REASONING:'):
-                result['reasoning'] = line.replace('REASONING:', '').strip()
+        if not steps or steps[0] == {'action': 'respond', 'input': ''}:
+            # The agent gets nothing to act on; the iteration is wasted
+            self.count_event("plan_parse_failures", {"response": response[:200]})
+        steps = steps[:self.max_actions_per_plan] or [{'action': 'respond', 'input': ''}]
+        result.update(steps[0])
+        result['actions'] = [dict(step, reasoning=result['reasoning']) for step in steps]
         
-        self.log(f"Planned action: {result['action']}", result)
+        self.log(f"Planned action: {', '.join(step['action'] for step in steps)}", result)
         return result
     
+    def plan_next_action(self, messages: List[AnyMessage], context: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Plan the next action based on current state.
+        
+        With streaming planning on, each planned read-only tool (see
+        src.tools.READ_ONLY_TOOLS) is started as soon as its ACTION and INPUT
+        lines (or its JSON step object) have arrived; its step then carries the
+        future under 'dispatched', and execute_action waits on it instead of
+        running the tool again. Tools that write memory or search are only run
+        once the plan is final, so a plan that changes on repair or retry never
+        repeats their effects.
+        Inside an async run the plan is requested in one call on the run's event loop.
+        """
+        planning_prompt = self.build_planning_prompt(context)
+        static_prompt = self.build_planning_template()
+        params = self.planning_params()
+        if not self.stream_planning or run_event_loop() is not None:
+            response = self.generate_response(messages, planning_prompt, static_prompt=static_prompt, params=params,
+                                              call_site='plan_next_action')
+            return self.parse_action_plan(response)
+        
+        full_prompt = self.build_prompt(messages, planning_prompt)
+        cached = self.lookup_cached_response(full_prompt, params=params, call_site='plan_next_action')
+        if cached is not None:
+            return self.parse_action_plan(cached)
+        
+        tool_names = {tool.name for tool in self.tools}
+        dispatched = []  # (action, input, future or None) per streamed step, in order
+        streams = {}  # attempt number -> parser
+        
+        def on_ready(action: str, tool_input: str):
+            # A retried stream re-announces the steps it already dispatched
+            index = streams[max(streams)].steps - 1
+            if index < len(dispatched):
+                return
+            future = None
+            input_schema = TOOL_INPUT_SCHEMAS.get(action)
+            if (action in tool_names and action in READ_ONLY_TOOLS
+                    and not (input_schema and validate(tool_input, input_schema))):
+                previous = next((f for _, _, f in reversed(dispatched) if f is not None), None)
+                future = self.dispatch_tool(action, tool_input, after=previous)
+            dispatched.append((action, tool_input, future))
+        
+        def on_chunk(attempt: int, chunk: str):
+            if attempt not in streams:
+                parser_class = JsonPlanStreamParser if self.structured_output else PlanStreamParser
+                streams[attempt] = parser_class(on_ready, self.max_actions_per_plan)
+            streams[attempt].feed(chunk)
+        
+        self.log("Generating response", {"prompt_length": len(full_prompt), "streaming": True})
+        try:
+            response = self.call_model_stream(full_prompt, on_chunk, prefix=self.prompt_prefix(static_prompt),
+                                              params=params)
+        except ModelCallError as e:
+            self.log(f"Error generating response: {str(e)}", {"error": str(e), "error_type": type(e).__name__})
+            raise
+        
+        result = response.text.strip()
+        self.log("Response generated", {"response_length": len(result), "streaming": True})
+        self.store_cached_response(full_prompt, result, params=params, call_site='plan_next_action')
+        
+        action_plan = self.parse_action_plan(result)
+        for step, (action, tool_input, future) in zip(action_plan['actions'], dispatched):
+            if (step['action'], step['input']) != (action, tool_input):
+                break
+            if future is not None:
+                step['dispatched'] = future
+        if 'dispatched' in action_plan['actions'][0]:
+            action_plan['dispatched'] = action_plan['actions'][0]['dispatched']
+        return action_plan
+    
+    async def aplan_next_action(self, messages: List[AnyMessage], context: Optional[str] = None) -> Dict[str, str]:
+        """Plan the next action without blocking the event loop."""
+        planning_prompt = self.build_planning_prompt(context)
+        params = self.planning_params()
+        response = await self.agenerate_response(messages, planning_prompt,
+                                                 static_prompt=self.build_planning_template(), params=params,
+                                                 call_site='plan_next_action')
+        # Parsing may make a repair call, so keep it off the event loop
+        ctx = off_loop_context()
+        return await asyncio.get_running_loop().run_in_executor(None, ctx.run, self.parse_action_plan, response)
+    
+    async def aprocess(self, messages: List[AnyMessage], **kwargs) -> Dict[str, Any]:
+        """
+        Async entry point used by the graph nodes.
+        
+        The agent's processing loop runs on a dedicated pool (see
+        get_agent_loop_executor). It builds prompts and parses replies there,
+        and sends every model call it makes (planning, generate_response,
+        generate_many, compaction) back to this loop as acomplete_prompt or
+        acall_model. Runs sharing a loop therefore share one async client and
+        the loop's concurrency, while the loop itself never blocks.
+        
+        Args:
+            messages: List of messages from conversation history
+            **kwargs: Additional parameters specific to agent type
+            
+        Returns:
+            Dict containing response and any additional data
+        """
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        ctx.run(_run_event_loop.set, loop)
+        return await loop.run_in_executor(get_agent_loop_executor(), lambda: ctx.run(self.process, messages, **kwargs))
+    
     def update_memory(self, key: str, value: Any):
         """Update agent's local memory."""
         self.memory.append({key: value})
@@ -0,0 +1,299 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class DiskLRUCache:
+    """
+    Bounded on-disk key/value store with least-recently-used eviction.
+
+    Each entry lives in its own JSON file named after its key, written atomically
+    so concurrent processes never see partial entries. Recency is tracked with the
+    file modification time, which lets a cache directory be reopened (or shared)
+    by later runs with its LRU order intact.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 1000, max_bytes: int = 50 * 1024 * 1024):
+        """
+        Initialize the cache, indexing any entries already on disk.
+
+        Args:
+            directory: Directory holding one file per entry
+            max_entries: Maximum number of entries kept
+            max_bytes: Maximum total size of entry files in bytes
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        """Rebuild the in-memory LRU index from the files on disk."""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, filename[:-len('.json')], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for a key, or None on a miss."""
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), 'r') as f:
+                    value = json.load(f)
+                os.utime(self._path(key))  # Mark as recently used for future runs
+            except (OSError, ValueError):
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        """Store a value, evicting least-recently-used entries to stay within bounds."""
+        data = json.dumps(value)
+        with self._lock:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)
+            size = len(data.encode('utf-8'))
+            self._index[key] = size
+            self._total_bytes += size
+
+            while self._index and (len(self._index) > self.max_entries or self._total_bytes > self.max_bytes):
+                oldest = next(iter(self._index))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        """Remove an entry from the index and disk. Caller must hold the lock."""
+        self._total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def delete(self, key: str):
+        """Remove an entry if it exists."""
+        with self._lock:
+            self._drop(key)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            for key in list(self._index):
+                self._drop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "bytes": self._total_bytes
+        }
+
+
+class ResponseCache:
+    """Content-addressed cache of LLM responses keyed by model, prompt and generation params."""
+
+    def __init__(self, directory: str, max_entries: int = 2000, max_bytes: int = 100 * 1024 * 1024):
+        self.store = DiskLRUCache(directory, max_entries=max_entries, max_bytes=max_bytes)
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Hash the inputs that fully determine a response."""
+        payload = json.dumps(
+            {"model": model_name, "prompt": prompt, "params": params or {}},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, model_name: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Return a cached response, or None on a miss."""
+        entry = self.store.get(self.make_key(model_name, prompt, params))
+        return entry["response"] if entry else None
+
+    def put(self, model_name: str, prompt: str, response: str, params: Optional[Dict[str, Any]] = None):
+        """Cache a response."""
+        self.store.put(self.make_key(model_name, prompt, params), {"model": model_name, "response": response})
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
+
+
+class SearchCache:
+    """
+    Cache of web search results keyed by normalized query, with a time-to-live.
+
+    Queries are only lower-cased and have their whitespace collapsed, so
+    "Solar  Prices" and "solar prices" share an entry. Everything else that can
+    change a search engine's answer (word order, negations, comparatives,
+    repeated terms, symbols) stays part of the key. Entries older than the TTL
+    are dropped when looked up, so results never get staler than that.
+    """
+
+    def __init__(self, directory: str, ttl: float = 24 * 3600, max_entries: int = 5000,
+                 max_bytes: int = 50 * 1024 * 1024):
+        """
+        Args:
+            directory: Directory holding one file per entry
+            ttl: Seconds a result stays valid
+            max_entries: Maximum number of entries kept
+            max_bytes: Maximum total size of entry files in bytes
+        """
+        self.store = DiskLRUCache(directory, max_entries=max_entries, max_bytes=max_bytes)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Lower-case a query and collapse its whitespace."""
+        return ' '.join(query.lower().split())
+
+    def make_key(self, query: str, source: str = "") -> str:
+        """Hash the normalized query, together with the search source it came from."""
+        payload = json.dumps({"query": self.normalize_query(query), "source": source}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, query: str, source: str = "") -> Optional[str]:
+        """Return the cached result for a query, or None if there is none or it has expired."""
+        key = self.make_key(query, source)
+        entry = self.store.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry.get("stored_at", 0) > self.ttl:
+                self.expired += 1
+                self.misses += 1
+                expired = True
+            else:
+                self.hits += 1
+                expired = False
+        if expired:
+            self.store.delete(key)
+            return None
+        return entry["result"]
+
+    def put(self, query: str, result: str, source: str = ""):
+        """Cache a search result."""
+        self.store.put(self.make_key(query, source), {
+            "query": query, "source": source, "result": result, "stored_at": time.time()
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "expired": self.expired,
+                "entries": self.store.stats()["entries"],
+                "evictions": self.store.evictions
+            }
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def enable_response_cache(directory: str = '.llm_cache', max_entries: int = 2000,
+                          max_bytes: int = 100 * 1024 * 1024) -> ResponseCache:
+    """Turn on the process-wide response cache used by every agent."""
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = ResponseCache(directory, max_entries=max_entries, max_bytes=max_bytes)
+        return _response_cache
+
+
+def disable_response_cache():
+    """Turn off the process-wide response cache."""
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache, or None if caching is off.
+
+    Caching is opt-in: call enable_response_cache() or set LLM_CACHE_DIR to the
+    directory the cache should live in.
+    """
+    global _response_cache
+    if _response_cache is None and os.getenv("LLM_CACHE_DIR"):
+        enable_response_cache(os.getenv("LLM_CACHE_DIR"))
+    return _response_cache
+
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def enable_search_cache(directory: str = '.search_cache', ttl: float = 24 * 3600, **kwargs) -> SearchCache:
+    """Turn on the process-wide web search cache."""
+    global _search_cache
+    with _search_cache_lock:
+        _search_cache = SearchCache(directory, ttl=ttl, **kwargs)
+        return _search_cache
+
+
+def disable_search_cache():
+    """Turn off the process-wide web search cache."""
+    global _search_cache
+    with _search_cache_lock:
+        _search_cache = None
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """
+    Get the process-wide web search cache, or None if it is off.
+
+    The cache is on by default, in SEARCH_CACHE_DIR (default .search_cache)
+    with a SEARCH_CACHE_TTL of 24 hours. Set SEARCH_CACHE=0 to turn it off.
+    """
+    if _search_cache is None and os.getenv("SEARCH_CACHE", "1") != "0":
+        enable_search_cache(os.getenv("SEARCH_CACHE_DIR", ".search_cache"),
+                            ttl=float(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600))))
+    return _search_cache
\ No newline at end of file
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rate_limiter import estimate_tokens
+
+# Compact once the rendered history passes this many estimated tokens; 0 disables compaction
+DEFAULT_COMPACTION_THRESHOLD = int(os.getenv("COMPACTION_THRESHOLD_TOKENS", "3000"))
+# Number of most recent messages always kept verbatim
+DEFAULT_KEEP_RECENT = int(os.getenv("COMPACTION_KEEP_RECENT", "6"))
+
+# (previous summary, lines to fold in) -> new summary, or None if summarization failed
+Summarizer = Callable[[str, List[str]], Optional[str]]
+
+# One history entry as seen by the prompt builder: (rendered line, tokens, pinned)
+Entry = Tuple[str, int, bool]
+
+
+class SummaryCache:
+    """
+    Process-wide cache of history summaries keyed by the hash of the span they cover.
+
+    In the orchestrator and swarm graphs every agent sees the same shared message
+    list, so a span summarized for one agent is reused by the others instead of
+    being summarized again.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            return None
+
+    def put(self, key: str, summary: str):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_summary_cache = SummaryCache()
+
+
+def span_key(lines: List[str]) -> str:
+    """Hash a span of rendered history lines."""
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class ConversationCompactor:
+    """
+    Rolling summarization of older conversation history.
+
+    Once the history passes threshold_tokens, every unpinned message except the
+    latest keep_recent is folded into a single summary entry. Later compactions
+    extend the existing summary with the messages that have aged out since, so
+    each message is summarized once and prompt size stays roughly flat as a run
+    goes on. Pinned messages (including the original task) are never summarized.
+    """
+
+    def __init__(self, summarize: Summarizer,
+                 threshold_tokens: int = DEFAULT_COMPACTION_THRESHOLD,
+                 keep_recent: int = DEFAULT_KEEP_RECENT,
+                 count_tokens: Callable[[str], int] = estimate_tokens,
+                 cache: Optional[SummaryCache] = None):
+        """
+        Initialize the compactor.
+
+        Args:
+            summarize: Produces the new summary from the previous one and the lines to fold in
+            threshold_tokens: History size that triggers a compaction
+            keep_recent: Messages at the end of the history always kept verbatim
+            count_tokens: Token counter for summaries
+            cache: Summary cache, defaults to the process-wide one
+        """
+        self.summarize = summarize
+        self.threshold_tokens = threshold_tokens
+        self.keep_recent = keep_recent
+        self.count_tokens = count_tokens
+        self.cache = cache or _summary_cache
+        # Rolling state: how many compactable lines the summary covers, and their hash
+        self._covered = 0
+        self._covered_key = span_key([])
+        self._summary = ""
+
+    def _summary_line(self) -> str:
+        return f"[Summary of {self._covered} earlier messages]\n{self._summary}\n"
+
+    def compact(self, entries: List[Entry]) -> List[Entry]:
+        """
+        Replace older unpinned entries with the rolling summary once over the threshold.
+
+        Args:
+            entries: Rendered history in order
+
+        Returns:
+            The history with the summarized span replaced by one pinned summary entry
+        """
+        if not self.threshold_tokens:
+            return entries
+
+        # Unpinned, non-empty entries in order; the last keep_recent stay verbatim
+        compactable = [i for i, (line, _, pinned) in enumerate(entries) if line and not pinned]
+        candidates = compactable[:max(len(compactable) - self.keep_recent, 0)]
+        lines = [entries[i][0] for i in candidates]
+
+        # The history was replaced (e.g. a new run): drop the rolling summary
+        if self._covered > len(lines) or span_key(lines[:self._covered]) != self._covered_key:
+            self._covered, self._covered_key, self._summary = 0, span_key([]), ""
+
+        summary_tokens = self.count_tokens(self._summary) if self._summary else 0
+        covered = set(candidates[:self._covered])
+        total = summary_tokens + sum(tokens for i, (_, tokens, _) in enumerate(entries) if i not in covered)
+
+        if total > self.threshold_tokens and len(lines) > self._covered:
+            key = span_key(lines)
+            summary = self.cache.get(key)
+            if summary is None:
+                summary = self.summarize(self._summary, lines[self._covered:])
+                if summary:
+                    self.cache.put(key, summary)
+            if summary:
+                self._covered, self._covered_key, self._summary = len(lines), key, summary
+                covered = set(candidates)
+
+        if not self._covered:
+            return entries
+
+        summary_line = self._summary_line()
+        compacted = []
+        for i, entry in enumerate(entries):
+            if i not in covered:
+                compacted.append(entry)
+            elif i == candidates[0]:
+                compacted.append((summary_line, self.count_tokens(summary_line), True))
+        return compacted
\ No newline at end of file
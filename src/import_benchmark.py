@@ -0,0 +1,75 @@
+"""
+Measure how long it takes to import the system's modules in a fresh interpreter.
+Usage: python import_benchmark.py [--repeat N] [module ...]
+
+Each measurement runs in a new subprocess so nothing is cached between runs.
+Importing should be cheap and side-effect free: no API keys, no network
+clients, no agents. That cost is paid when a team first runs, which is
+reported separately as "first graph build".
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import os
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "src.base_agent",
+    "src.tools",
+    "src.orchestrator.orchestrator_graph",
+    "src.swarm.swarm_graph",
+]
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+BUILD_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+import {module}
+start = time.perf_counter()
+{module}.{builder}()
+print(time.perf_counter() - start)
+"""
+
+GRAPH_BUILDERS = {
+    "src.orchestrator.orchestrator_graph": "build_orchestrator_graph",
+    "src.swarm.swarm_graph": "build_swarm_graph",
+}
+
+
+def time_snippet(snippet: str, repeat: int) -> float:
+    """Run a timing snippet in fresh interpreters and return the median seconds."""
+    env = dict(os.environ, MODEL_BACKEND="stub")
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", snippet], capture_output=True, text=True, check=True, env=env
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold import-time benchmark")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement")
+    args = parser.parse_args()
+
+    print(f"Cold import times (median of {args.repeat} fresh interpreters)")
+    print("="*60)
+    for module in args.modules:
+        seconds = time_snippet(IMPORT_SNIPPET.format(root=PACKAGE_ROOT, module=module), args.repeat)
+        print(f"{module:<40} {seconds * 1000:8.1f} ms")
+
+        builder = GRAPH_BUILDERS.get(module)
+        if builder:
+            seconds = time_snippet(BUILD_SNIPPET.format(root=PACKAGE_ROOT, module=module, builder=builder), args.repeat)
+            print(f"{'  first graph build':<40} {seconds * 1000:8.1f} ms")
\ No newline at end of file
@@ -0,0 +1,86 @@
+import contextvars
+import importlib
+import threading
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# Agents of the current run, keyed by their LazyAgent (see start_agent_scope)
+_run_agents: contextvars.ContextVar[Optional[Dict["LazyAgent", Any]]] = contextvars.ContextVar(
+    "run_agents", default=None
+)
+
+
+def start_agent_scope():
+    """
+    Give the current run its own agents.
+    
+    After this call every LazyAgent used in this context (and the graph nodes
+    it runs, which inherit it) creates and reuses instances private to the run,
+    so concurrent runs never share loggers, counters or task status.
+    """
+    _run_agents.set({})
+
+
+class LazyAgent:
+    """
+    Module-level stand-in for an agent that is created on first use.
+
+    The graph modules hold their agents as globals. Wrapping the constructor
+    keeps that shape while making the import itself cheap and side-effect free:
+    the agent's module (and with it the tools and langchain tool machinery), its
+    backend and any model configuration are only loaded when a node first runs.
+    Inside a run started with start_agent_scope the agent is the run's own
+    instance; outside one it is a single process-wide instance.
+    """
+
+    def __init__(self, factory: Union[str, Callable[[], Any]]):
+        """
+        Args:
+            factory: The agent class or another callable, or a "package.module:ClassName" path
+        """
+        self._factory = factory
+        self._agent = None
+        self._lock = threading.Lock()
+
+    def _create(self) -> Any:
+        if isinstance(self._factory, str):
+            module_name, class_name = self._factory.split(':')
+            return getattr(importlib.import_module(module_name), class_name)()
+        return self._factory()
+
+    def get(self) -> Any:
+        """Return the agent for the current run, creating it if this is the run's first use."""
+        agents = _run_agents.get()
+        if agents is not None:
+            agent = agents.get(self)
+            if agent is None:
+                with self._lock:
+                    agent = agents.get(self)
+                    if agent is None:
+                        agent = agents[self] = self._create()
+            return agent
+        
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._agent = self._create()
+        return self._agent
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ('_factory', '_agent', '_lock'):  # Not yet set (e.g. during copy)
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        if self._agent is not None:
+            return repr(self._agent)
+        return f"LazyAgent({self._factory if isinstance(self._factory, str) else self._factory.__name__})"
+
+
+def add_messages(left: List, right: List) -> List:
+    """
+    Message-list reducer for graph state; defers importing langgraph until a graph runs.
+
+    Delegates to langgraph.graph.message.add_messages, whose import pulls in most of langgraph.
+    """
+    from langgraph.graph.message import add_messages as langgraph_add_messages
+    return langgraph_add_messages(left, right)
\ No newline at end of file
@@ -4,6 +4,7 @@ from datetime import datetime
 from typing import Optional, Any
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.usage_ledger import UsageLedger
 
 
 class AgentLogger:
@@ -88,7 +89,8 @@ class AgentLogger:
         """Get the current log number."""
         return self.log_number
 
-def save_report(report: str, team_type: str, task: str, log_number: int) -> str:
+def save_report(report: str, team_type: str, task: str, log_number: int,
+                ledger: Optional[UsageLedger] = None) -> str:
     """
     Save a report to file.
     
@@ -97,6 +99,7 @@ def save_report(report: str, team_type: str, task: str, log_number: int) -> str:
         team_type: Either 'orchestrator' or 'swarm'
         task: The task description
         log_number: The log number to match with the log file
+        ledger: Optional usage ledger for the run, saved next to the report as JSON
         
     Returns:
         The filename where the report was saved
@@ -109,12 +112,22 @@ def save_report(report: str, team_type: str, task: str, log_number: int) -> str:
     safe_task = task[:50].replace('/', '_').replace(' ', '_')
     filename = f'reports/{team_type}_report_{log_number}_{timestamp}_{safe_task}.md'
     
+    # Save the usage ledger alongside the report
+    ledger_filename = None
+    if ledger is not None:
+        ledger_filename = ledger.save(filename[:-len('.md')] + '_usage.json')
+    
     # Save report with metadata
     with open(filename, 'w') as f:
         f.write(f"# Report Generated by {team_type.capitalize()} Team\n\n")
         f.write(f"**Task**: {task}  \n")
         f.write(f"**Generated**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  \n")
         f.write(f"**Log File**: [{team_type}_log_{log_number}.txt](logs/{team_type}_log_{log_number}.txt)  \n")
+        if ledger_filename:
+            totals = ledger.summary()["totals"]
+            f.write(f"**Usage Ledger**: [{os.path.basename(ledger_filename)}]({os.path.basename(ledger_filename)}) "
+                    f"({totals['api_calls']} API calls, {totals['input_tokens']} input / {totals['output_tokens']} output tokens, "
+                    f"{totals['cached_input_tokens']} cached input tokens)  \n")
         f.write(f"\n{'='*60}\n\n")
         f.write(report)
     
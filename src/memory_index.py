@@ -0,0 +1,155 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Common English words that carry no retrieval signal
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in into is it its of on or that the their there these this
+to was were will with which who what when where how than then so such can could should would may might
+also more most other some any all not no about over under between after before during each our we you they
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case a text and split it into terms, dropping stopwords."""
+    return [term for term in _TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+def split_passages(text: str, max_words: int = 120) -> List[str]:
+    """
+    Split a text into passages of about max_words words.
+
+    Paragraphs are kept together where they fit; short ones are merged and
+    long ones are split between sentences.
+    """
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph.split()) <= max_words:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(sentence.strip() for sentence in re.split(r'(?<=[.!?])\s+', paragraph) if sentence.strip())
+
+    passages, current, current_words = [], [], 0
+    for piece in pieces:
+        words = len(piece.split())
+        if current and current_words + words > max_words:
+            passages.append(' '.join(current))
+            current, current_words = [], 0
+        current.append(piece)
+        current_words += words
+    if current:
+        passages.append(' '.join(current))
+    return passages
+
+
+class BM25Index:
+    """
+    Incrementally maintained inverted index with Okapi BM25 ranking.
+
+    Documents are split into passages, and passages are what searches rank and
+    return. Adding a document again replaces its old passages, so the index can
+    follow a store whose values are overwritten.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, passage_words: int = 120):
+        """
+        Args:
+            k1: Term-frequency saturation
+            b: Strength of passage-length normalization
+            passage_words: Approximate passage size in words
+        """
+        self.k1 = k1
+        self.b = b
+        self.passage_words = passage_words
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # term -> passage id -> term frequency
+        self._passages: Dict[int, Tuple[str, str, int, Tuple[str, ...]]] = {}  # passage id -> (doc id, text, length, distinct terms)
+        self._documents: Dict[str, List[int]] = {}  # doc id -> passage ids
+        self._total_length = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any earlier version of it."""
+        passages = [(passage, tokenize(passage)) for passage in split_passages(text, self.passage_words)]
+        with self._lock:
+            self._remove(doc_id)
+            ids = []
+            for passage, terms in passages:
+                if not terms:
+                    continue
+                passage_id = self._next_id
+                self._next_id += 1
+                frequencies = Counter(terms)
+                for term, frequency in frequencies.items():
+                    self._postings[term][passage_id] = frequency
+                self._passages[passage_id] = (doc_id, passage, len(terms), tuple(frequencies))
+                self._total_length += len(terms)
+                ids.append(passage_id)
+            self._documents[doc_id] = ids
+
+    def remove(self, doc_id: str):
+        """Drop a document from the index."""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        for passage_id in self._documents.pop(doc_id, []):
+            _, _, length, terms = self._passages.pop(passage_id)
+            self._total_length -= length
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(passage_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    def search(self, query: str, k: int = 5, doc_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, str, float]]:
+        """
+        Rank passages against a query.
+
+        Args:
+            query: Free-text query
+            k: Number of passages to return
+            doc_ids: Only search passages of these documents
+
+        Returns:
+            Up to k (doc id, passage, score) tuples, best first
+        """
+        terms = set(tokenize(query))
+        allowed = set(doc_ids) if doc_ids is not None else None
+        with self._lock:
+            count = len(self._passages)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id, frequency in postings.items():
+                    doc_id, _, length, _ = self._passages[passage_id]
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[passage_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._passages[passage_id][0], self._passages[passage_id][1], score)
+                    for passage_id, score in best]
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"documents": len(self._documents), "passages": len(self._passages), "terms": len(self._postings)}
\ No newline at end of file
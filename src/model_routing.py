@@ -0,0 +1,82 @@
+import os
+import threading
+from typing import Dict, Optional
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rate_limiter import DEFAULT_RATE_LIMIT, MODEL_RATE_LIMITS
+
+# Small, low-latency model for short classification prompts
+SMALL_MODEL = os.getenv("SMALL_MODEL", "gemini-2.0-flash-lite")
+
+# Call sites (the BaseAgent method names passed to generate_routed) sent to the
+# small model by default. Each returns a label or a score, not prose.
+DEFAULT_MODEL_ROUTES: Dict[str, str] = {
+    "determine_next_agent_dynamically": SMALL_MODEL,
+    "is_research_complete": SMALL_MODEL,
+    "assess_research_completeness": SMALL_MODEL,
+    "is_analysis_complete": SMALL_MODEL,
+    "assess_report_quality": SMALL_MODEL,
+    "final_quality_assessment": SMALL_MODEL,
+    "repair_structured_output": SMALL_MODEL,  # One-shot fix of JSON that failed validation
+}
+
+_routes: Dict[str, str] = {}
+_routes_lock = threading.Lock()
+_routes_loaded = False
+
+
+def _parse_routes(spec: str) -> Dict[str, str]:
+    """Parse MODEL_ROUTES, e.g. "assess_report_quality=gemini-2.0-flash,is_research_complete=default"."""
+    routes = {}
+    for item in spec.split(','):
+        if '=' in item:
+            call_site, model_name = item.split('=', 1)
+            routes[call_site.strip()] = model_name.strip()
+    return routes
+
+
+def _load_routes():
+    global _routes_loaded
+    if not _routes_loaded:
+        _routes.update(DEFAULT_MODEL_ROUTES)
+        _routes.update(_parse_routes(os.getenv("MODEL_ROUTES", "")))
+        _routes_loaded = True
+
+
+def configure_model_route(call_site: str, model_name: Optional[str]):
+    """
+    Route a call site to a model.
+
+    Args:
+        call_site: Name the agent passes to generate_routed
+        model_name: Model to use, or None / 'default' to use the agent's own model
+    """
+    with _routes_lock:
+        _load_routes()
+        _routes[call_site] = model_name or "default"
+
+
+def _requests_per_minute(model_name: str) -> int:
+    return MODEL_RATE_LIMITS.get(model_name, DEFAULT_RATE_LIMIT)[0]
+
+
+def get_model_route(call_site: str, agent_model: Optional[str] = None) -> Optional[str]:
+    """
+    Return the model configured for a call site, or None to use the agent's own model.
+
+    Args:
+        call_site: Name the agent passes to generate_routed
+        agent_model: The calling agent's model. A route to a model with a lower
+            request quota than this one is skipped, since moving calls onto it
+            would make them queue behind its rate limit.
+    """
+    if os.getenv("MODEL_ROUTING", "1") == "0":
+        return None
+    with _routes_lock:
+        _load_routes()
+        model_name = _routes.get(call_site)
+    if model_name in (None, "", "default", agent_model):
+        return None
+    if agent_model and _requests_per_minute(model_name) < _requests_per_minute(agent_model):
+        return None
+    return model_name
@@ -1,10 +1,12 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from langchain_core.messages import AnyMessage, AIMessage
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.base_agent import BaseAgent
+from src.shared_memory import get_shared_memory
+from src.structured_output import DECISION_SCHEMA
 from src.tools import ANALYSIS_TOOLS
 
 class AnalysisAgent(BaseAgent):
@@ -14,6 +16,7 @@ class AnalysisAgent(BaseAgent):
         super().__init__("Analysis Agent (Orchestrator Team)", ANALYSIS_TOOLS)
         self.analysis_iterations = 0
         self.max_iterations = 6
+        self.max_actions_per_plan = 3  # Actions run per planning call before re-planning
         self.min_insights_required = 4
     
     def get_system_prompt(self) -> str:
@@ -51,25 +54,26 @@ class AnalysisAgent(BaseAgent):
             # Plan next analytical action
             action_plan = self.plan_next_action(messages, context)
             
-            # Execute planned action
-            if action_plan['action'] == 'respond':
-                # Direct analytical insight
-                analysis_results.append({
-                    'type': 'insight',
-                    'content': action_plan['input']
-                })
-            else:
-                # Execute analytical tool
-                result = self.execute_tool(action_plan['action'], action_plan['input'])
-                analysis_results.append({
-                    'tool': action_plan['action'],
-                    'input': action_plan.get('input', ''),
-                    'result': result,
-                    'reasoning': action_plan['reasoning']
-                })
-                
-                # Update messages for context
-                messages.append(AIMessage(content=f"Analysis result: {result[:200]}..."))
+            # Execute the planned actions in order
+            for step in action_plan['actions']:
+                if step['action'] == 'respond':
+                    # Direct analytical insight
+                    analysis_results.append({
+                        'type': 'insight',
+                        'content': step['input']
+                    })
+                else:
+                    # Execute analytical tool
+                    result = self.execute_action(step)
+                    analysis_results.append({
+                        'tool': step['action'],
+                        'input': step.get('input', ''),
+                        'result': result,
+                        'reasoning': step['reasoning']
+                    })
+                    
+                    # Update messages for context
+                    messages.append(AIMessage(content=f"Analysis result: {result[:200]}..."))
             
             self.analysis_iterations += 1
             
@@ -78,8 +82,7 @@ class AnalysisAgent(BaseAgent):
                 break
         
         # Generate final insights and recommendations
-        final_insights = self.generate_comprehensive_insights(analysis_results)
-        consistency_report = self.generate_consistency_report(analysis_results)
+        final_insights, consistency_report = self.generate_final_reports(analysis_results)
         
         # Save everything to memory
         self.save_analysis_results(analysis_results, final_insights, consistency_report)
@@ -170,12 +173,26 @@ class AnalysisAgent(BaseAgent):
         
         Answer: COMPLETE or CONTINUE"""
         
-        response = self.generate_response([], assessment_prompt)
+        response = self.generate_routed(
+            'is_analysis_complete', [], assessment_prompt,
+            lambda answer: 'COMPLETE' in answer.upper() or 'CONTINUE' in answer.upper(),
+            schema=DECISION_SCHEMA
+        )
         return "COMPLETE" in response.upper()
     
-    def generate_comprehensive_insights(self, analysis_results: List) -> str:
-        """Generate comprehensive insights from all analyses."""
-        insights_prompt = f"""Based on all analytical work performed:
+    def generate_final_reports(self, analysis_results: List) -> Tuple[str, str]:
+        """Generate the final insights and the consistency report concurrently, as neither depends on the other."""
+        insights_prompt = self.build_insights_prompt(analysis_results)
+        report_prompt = self.build_consistency_prompt(analysis_results)
+        if report_prompt is None:
+            return self.generate_response([], insights_prompt), "No formal consistency checks performed."
+        
+        insights, consistency = self.generate_many([insights_prompt, report_prompt])
+        return insights.result(), consistency.result()
+    
+    def build_insights_prompt(self, analysis_results: List) -> str:
+        """Prompt asking for the key insights of all analyses."""
+        return f"""Based on all analytical work performed:
         
         {self.format_analysis_results(analysis_results)}
         
@@ -192,11 +209,9 @@ class AnalysisAgent(BaseAgent):
         - Implications
         
         These insights will drive the final report."""
-        
-        return self.generate_response([], insights_prompt)
     
-    def generate_consistency_report(self, analysis_results: List) -> str:
-        """Generate report on data consistency and reliability."""
+    def build_consistency_prompt(self, analysis_results: List) -> Optional[str]:
+        """Prompt asking for a reliability assessment, or None if no consistency checks were performed."""
         # Extract consistency checks from results
         consistency_checks = []
         for result in analysis_results:
@@ -204,9 +219,9 @@ class AnalysisAgent(BaseAgent):
                 consistency_checks.append(result)
         
         if not consistency_checks:
-            return "No formal consistency checks performed."
+            return None
         
-        report_prompt = f"""Based on consistency checks performed:
+        return f"""Based on consistency checks performed:
         
         {self.format_consistency_checks(consistency_checks)}
         
@@ -217,28 +232,18 @@ class AnalysisAgent(BaseAgent):
         4. Recommendations for the writer
         
         Be honest about any limitations or uncertainties."""
-        
-        return self.generate_response([], report_prompt)
     
     def save_analysis_results(self, results: List, insights: str, consistency: str):
-        """Save all analysis results to memory."""
-        # Find save_to_memory tool
-        save_tool = None
-        for tool in self.tools:
-            if 'save' in tool.name.lower() and 'memory' in tool.name.lower():
-                save_tool = tool
-                break
-        
-        if save_tool:
-            # Save main components
-            self.execute_tool(save_tool.name, f"analysis_complete::true")
-            self.execute_tool(save_tool.name, f"analysis_insights::{insights}")
-            self.execute_tool(save_tool.name, f"key_insights::{insights[:1000]}")
-            self.execute_tool(save_tool.name, f"consistency_report::{consistency}")
-            
-            # Save detailed results
-            analysis_summary = self.create_analysis_summary(results)
-            self.execute_tool(save_tool.name, f"analysis_results::{analysis_summary}")
+        """Save all analysis results to memory in one write."""
+        entries = {
+            "analysis_complete": "true",
+            "analysis_insights": insights,
+            "key_insights": insights[:1000],
+            "consistency_report": consistency,
+            "analysis_results": self.create_analysis_summary(results)
+        }
+        get_shared_memory().set_many(entries)
+        self.log("Saved analysis results to memory", {"keys": list(entries)})
     
     def format_analysis_results(self, results: List) -> str:
         """Format analysis results for prompt."""
@@ -5,6 +5,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.base_agent import BaseAgent
+from src.shared_memory import MemoryWatch, get_shared_memory
+from src.structured_output import choice_schema
 from src.tools import ORCHESTRATOR_TOOLS
 
 class OrchestratorAgent(BaseAgent):
@@ -20,6 +22,12 @@ class OrchestratorAgent(BaseAgent):
         }
         self.max_delegation_iterations = 10
         self.current_iteration = 0
+        # Memory keys that mark a phase as done; progress is only re-read after one of them changes
+        self.progress_watch = MemoryWatch([
+            'research_synthesis', 'research_summary',
+            'analysis_insights', 'analysis_complete',
+            'final_report'
+        ])
     
     def get_system_prompt(self) -> str:
         return """You are the Orchestrator agent responsible for coordinating a team of specialized agents
@@ -59,7 +67,7 @@ class OrchestratorAgent(BaseAgent):
         
         # If agent decides to use a tool
         if action_plan['action'] != 'respond':
-            tool_result = self.execute_tool(action_plan['action'], action_plan['input'])
+            tool_result = self.execute_action(action_plan)
             messages.append(AIMessage(content=f"Tool result: {tool_result}"))
             # Recursively call to make next decision
             return self.process(messages, **kwargs)
@@ -97,11 +105,14 @@ class OrchestratorAgent(BaseAgent):
         }
     
     def check_progress(self) -> str:
-        """Check progress by examining memory."""
+        """Check progress by examining memory, skipping the read if no phase output changed."""
+        return self.progress_watch.cached(self.read_progress)
+    
+    def read_progress(self) -> str:
+        """Summarize which phases have saved their output to memory."""
         progress_parts = []
         
-        # Use tools to check what's in memory
-        memory_keys = self.execute_tool('list_memory_keys', '')
+        memory_keys = set(get_shared_memory().keys())
         
         # Check for key outputs
         if 'research_synthesis' in memory_keys or 'research_summary' in memory_keys:
@@ -142,10 +153,15 @@ class OrchestratorAgent(BaseAgent):
         
         Respond with just the agent name or 'complete'."""
         
-        response = self.generate_response(messages, decision_prompt).strip().lower()
+        options = self.available_agents + ["complete"]
+        response = self.generate_routed(
+            'determine_next_agent_dynamically', messages, decision_prompt,
+            lambda answer: answer.strip().lower() in options,
+            schema=choice_schema(options)
+        ).strip().lower()
         
         # Validate response
-        if response in self.available_agents + ["complete"]:
+        if response in options:
             return response
         
         # Fallback logic based on status
@@ -209,10 +225,10 @@ class OrchestratorAgent(BaseAgent):
     
     def verify_completion(self) -> Dict[str, Any]:
         """Verify if the task is truly complete with high standards."""
-        # Check final report quality
-        report = self.execute_tool('read_from_memory', 'final_report')
+        # Check final report quality from its opening, without loading the whole report
+        report_preview = get_shared_memory().preview('final_report', 500)
         
-        if "No data found" in report:
+        if report_preview is None:
             return {
                 'is_complete': False,
                 'needed_agent': 'writer',
@@ -221,7 +237,7 @@ class OrchestratorAgent(BaseAgent):
         
         verification_prompt = f"""Assess if this task is complete to high standards:
         
-        Report preview: {report[:500]}...
+        Report preview: {report_preview}
         
         Check:
         1. Is there a complete report (not just an outline)?
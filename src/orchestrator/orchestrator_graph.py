@@ -1,16 +1,15 @@
-from typing import TypedDict, List, Annotated
-from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
+from typing import TypedDict, List, Annotated, Optional
 from langchain_core.messages import AnyMessage, HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from src.orchestrator.orchestrator_agent import OrchestratorAgent
-from src.orchestrator.research_agent import ResearchAgent
-from src.orchestrator.analysis_agent import AnalysisAgent
-from src.orchestrator.writer_agent import WriterAgent
 from src.logging_utils import AgentLogger, save_report, log_agent_communication
+from src.resilience import ModelCallError
+from src.usage_ledger import UsageLedger, track_node
+from src.lazy import LazyAgent, add_messages, start_agent_scope
+from src.shared_memory import finish_memory_namespace, get_shared_memory, start_memory_namespace
 
 class OrchestratorState(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
@@ -21,19 +20,26 @@ class OrchestratorState(TypedDict):
     iteration_count: int
     max_iterations: int
     logger: AgentLogger
+    ledger: UsageLedger
+    error: Optional[str]
 
-orchestrator = OrchestratorAgent()
-research_agent = ResearchAgent()
-analysis_agent = AnalysisAgent()
-writer_agent = WriterAgent()
+# Agents are created on first use, so importing this module stays cheap; each run gets its own
+orchestrator = LazyAgent("src.orchestrator.orchestrator_agent:OrchestratorAgent")
+research_agent = LazyAgent("src.orchestrator.research_agent:ResearchAgent")
+analysis_agent = LazyAgent("src.orchestrator.analysis_agent:AnalysisAgent")
+writer_agent = LazyAgent("src.orchestrator.writer_agent:WriterAgent")
 
-def orchestrator_node(state: OrchestratorState) -> OrchestratorState:
-    """Orchestrator decides next steps."""
-    orchestrator.set_logger(state["logger"])
-    orchestrator.log("Processing task and determining next agent")
+def apply_model_error(state: OrchestratorState, agent, error: ModelCallError) -> OrchestratorState:
+    """Record a failed model call so the graph ends the run instead of spending more round trips."""
+    agent.log(f"Model call failed, stopping run: {str(error)}", {"error_type": type(error).__name__})
     
-    result = orchestrator.process(state["messages"])
+    new_state = state.copy()
+    new_state["error"] = f"{type(error).__name__}: {str(error)}"
     
+    return new_state
+
+def apply_orchestrator_result(state: OrchestratorState, result: dict) -> OrchestratorState:
+    """Fold the orchestrator's decision into the graph state."""
     new_state = state.copy()
     new_state["messages"].extend(result["messages"])
     new_state["iteration_count"] += 1
@@ -55,16 +61,34 @@ def orchestrator_node(state: OrchestratorState) -> OrchestratorState:
         
     return new_state
 
-def research_node(state: OrchestratorState) -> OrchestratorState:
-    """Research agent performs research."""
-    research_agent.set_logger(state["logger"])
-    research_agent.log(f"Starting research with instruction: {state['current_instruction'][:100]}...")
+@track_node("orchestrator")
+def orchestrator_node(state: OrchestratorState) -> OrchestratorState:
+    """Orchestrator decides next steps."""
+    orchestrator.set_logger(state["logger"])
+    orchestrator.log("Processing task and determining next agent")
     
-    result = research_agent.process(
-        state["messages"], 
-        instruction=state["current_instruction"]
-    )
+    try:
+        result = orchestrator.process(state["messages"])
+    except ModelCallError as e:
+        return apply_model_error(state, orchestrator, e)
     
+    return apply_orchestrator_result(state, result)
+
+@track_node("orchestrator")
+async def aorchestrator_node(state: OrchestratorState) -> OrchestratorState:
+    """Orchestrator decides next steps (async)."""
+    orchestrator.set_logger(state["logger"])
+    orchestrator.log("Processing task and determining next agent")
+    
+    try:
+        result = await orchestrator.aprocess(state["messages"])
+    except ModelCallError as e:
+        return apply_model_error(state, orchestrator, e)
+    
+    return apply_orchestrator_result(state, result)
+
+def apply_research_result(state: OrchestratorState, result: dict) -> OrchestratorState:
+    """Fold the research agent's output into the graph state."""
     new_state = state.copy()
     new_state["messages"].extend(result["messages"])
     new_state["iteration_count"] += 1
@@ -85,16 +109,40 @@ def research_node(state: OrchestratorState) -> OrchestratorState:
     
     return new_state
 
-def analysis_node(state: OrchestratorState) -> OrchestratorState:
-    """Analysis agent analyzes findings."""
-    analysis_agent.set_logger(state["logger"])
-    analysis_agent.log(f"Starting analysis with instruction: {state['current_instruction'][:100]}...")
+@track_node("research")
+def research_node(state: OrchestratorState) -> OrchestratorState:
+    """Research agent performs research."""
+    research_agent.set_logger(state["logger"])
+    research_agent.log(f"Starting research with instruction: {state['current_instruction'][:100]}...")
     
-    result = analysis_agent.process(
-        state["messages"],
-        instruction=state["current_instruction"]
-    )
+    try:
+        result = research_agent.process(
+            state["messages"], 
+            instruction=state["current_instruction"]
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, research_agent, e)
     
+    return apply_research_result(state, result)
+
+@track_node("research")
+async def aresearch_node(state: OrchestratorState) -> OrchestratorState:
+    """Research agent performs research (async)."""
+    research_agent.set_logger(state["logger"])
+    research_agent.log(f"Starting research with instruction: {state['current_instruction'][:100]}...")
+    
+    try:
+        result = await research_agent.aprocess(
+            state["messages"], 
+            instruction=state["current_instruction"]
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, research_agent, e)
+    
+    return apply_research_result(state, result)
+
+def apply_analysis_result(state: OrchestratorState, result: dict) -> OrchestratorState:
+    """Fold the analysis agent's output into the graph state."""
     new_state = state.copy()
     new_state["messages"].extend(result["messages"])
     new_state["iteration_count"] += 1
@@ -115,16 +163,40 @@ def analysis_node(state: OrchestratorState) -> OrchestratorState:
     
     return new_state
 
-def writer_node(state: OrchestratorState) -> OrchestratorState:
-    """Writer agent creates final report."""
-    writer_agent.set_logger(state["logger"])
-    writer_agent.log(f"Starting report writing with instruction: {state['current_instruction'][:100]}...")
+@track_node("analysis")
+def analysis_node(state: OrchestratorState) -> OrchestratorState:
+    """Analysis agent analyzes findings."""
+    analysis_agent.set_logger(state["logger"])
+    analysis_agent.log(f"Starting analysis with instruction: {state['current_instruction'][:100]}...")
     
-    result = writer_agent.process(
-        state["messages"],
-        instruction=state["current_instruction"]
-    )
+    try:
+        result = analysis_agent.process(
+            state["messages"],
+            instruction=state["current_instruction"]
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, analysis_agent, e)
+    
+    return apply_analysis_result(state, result)
+
+@track_node("analysis")
+async def aanalysis_node(state: OrchestratorState) -> OrchestratorState:
+    """Analysis agent analyzes findings (async)."""
+    analysis_agent.set_logger(state["logger"])
+    analysis_agent.log(f"Starting analysis with instruction: {state['current_instruction'][:100]}...")
+    
+    try:
+        result = await analysis_agent.aprocess(
+            state["messages"],
+            instruction=state["current_instruction"]
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, analysis_agent, e)
     
+    return apply_analysis_result(state, result)
+
+def apply_writer_result(state: OrchestratorState, result: dict) -> OrchestratorState:
+    """Fold the writer agent's output into the graph state."""
     new_state = state.copy()
     new_state["messages"].extend(result["messages"])
     new_state["iteration_count"] += 1
@@ -146,8 +218,46 @@ def writer_node(state: OrchestratorState) -> OrchestratorState:
     
     return new_state
 
+@track_node("writer")
+def writer_node(state: OrchestratorState) -> OrchestratorState:
+    """Writer agent creates final report."""
+    writer_agent.set_logger(state["logger"])
+    writer_agent.log(f"Starting report writing with instruction: {state['current_instruction'][:100]}...")
+    
+    try:
+        result = writer_agent.process(
+            state["messages"],
+            instruction=state["current_instruction"]
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, writer_agent, e)
+    
+    return apply_writer_result(state, result)
+
+@track_node("writer")
+async def awriter_node(state: OrchestratorState) -> OrchestratorState:
+    """Writer agent creates final report (async)."""
+    writer_agent.set_logger(state["logger"])
+    writer_agent.log(f"Starting report writing with instruction: {state['current_instruction'][:100]}...")
+    
+    try:
+        result = await writer_agent.aprocess(
+            state["messages"],
+            instruction=state["current_instruction"]
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, writer_agent, e)
+    
+    return apply_writer_result(state, result)
+
 def route_next_agent(state: OrchestratorState) -> str:
     """Route to the next agent based on current state."""
+    from langgraph.graph import END
+    
+    if state.get("error"):
+        state["logger"].log("System", f"Stopping after model failure: {state['error']}")
+        return END
+    
     if state["task_complete"]:
         return END
     
@@ -167,14 +277,27 @@ def route_next_agent(state: OrchestratorState) -> str:
     else:
         return "orchestrator"
 
+def route_back_to_orchestrator(state: OrchestratorState) -> str:
+    """Return control to the orchestrator, or end the run after a model failure."""
+    from langgraph.graph import END
+    
+    if state.get("error"):
+        state["logger"].log("System", f"Stopping after model failure: {state['error']}")
+        return END
+    return "orchestrator"
+
 def build_orchestrator_graph():
     """Build the orchestrator team graph."""
+    from langgraph.graph import StateGraph, START, END
+    
     workflow = StateGraph(OrchestratorState)
     
-    workflow.add_node("orchestrator", orchestrator_node)
-    workflow.add_node("research", research_node)
-    workflow.add_node("analysis", analysis_node)
-    workflow.add_node("writer", writer_node)
+    # Each node has a sync and an async implementation so the same graph
+    # can be driven by invoke() or by ainvoke() on a shared event loop
+    workflow.add_node("orchestrator", RunnableLambda(orchestrator_node, afunc=aorchestrator_node))
+    workflow.add_node("research", RunnableLambda(research_node, afunc=aresearch_node))
+    workflow.add_node("analysis", RunnableLambda(analysis_node, afunc=aanalysis_node))
+    workflow.add_node("writer", RunnableLambda(writer_node, afunc=awriter_node))
     
     workflow.add_edge(START, "orchestrator")
     
@@ -190,19 +313,28 @@ def build_orchestrator_graph():
         }
     )
     
-    workflow.add_edge("research", "orchestrator")
-    workflow.add_edge("analysis", "orchestrator")
-    workflow.add_edge("writer", "orchestrator")
+    # Agents always report back to the orchestrator unless a model failure ended the run
+    for agent in ["research", "analysis", "writer"]:
+        workflow.add_conditional_edges(
+            agent,
+            route_back_to_orchestrator,
+            {
+                "orchestrator": "orchestrator",
+                END: END
+            }
+        )
     
     return workflow.compile()
 
-def run_orchestrator_team(task: str, word_count: int = 500) -> str:
-    """Run the orchestrator team on a given task."""
-    if os.path.exists('shared_memory.json'):
-        os.remove('shared_memory.json')
+def start_orchestrator_run(task: str, word_count: int = 500) -> tuple:
+    """Give the run its own memory namespace and agents, and build the logger, graph and initial state."""
+    namespace = start_memory_namespace("orchestrator")
+    start_agent_scope()
     
     logger = AgentLogger("orchestrator")
+    ledger = UsageLedger("orchestrator", task)
     logger.log("System", f"Starting orchestrator team for task: {task}")
+    logger.log("System", f"Shared memory namespace: {namespace}")
     logger.log("System", f"Target word count: {word_count}")
     logger.log_separator("Task Execution - Centralized Orchestration")
     
@@ -218,24 +350,26 @@ def run_orchestrator_team(task: str, word_count: int = 500) -> str:
         "report": "",
         "iteration_count": 0,
         "max_iterations": 25,
-        "logger": logger
+        "logger": logger,
+        "ledger": ledger,
+        "error": None
     }
     
-    result = graph.invoke(initial_state)
+    return logger, graph, initial_state
+
+def finish_orchestrator_run(task: str, logger: AgentLogger, result: dict) -> str:
+    """Extract, log and save the report produced by a finished run; call before finish_memory_namespace."""
+    if result.get("error"):
+        logger.log("System", f"Run stopped early by model failure: {result['error']}")
     
     report = result.get("report")
     if not report:
-        try:
-            from src.tools import read_from_memory
-            report = read_from_memory.invoke("final_report")
-            if "No data found" not in report:
-                logger.log("System", "Retrieved report from shared memory")
-            else:
-                report = "Report generation did not complete successfully."
-                logger.log("System", "Report generation failed - no report found")
-        except Exception as e:
-            logger.log("System", f"Error retrieving report: {str(e)}")
+        report = get_shared_memory().get("final_report")
+        if report:
+            logger.log("System", "Retrieved report from shared memory")
+        else:
             report = "Report generation did not complete successfully."
+            logger.log("System", "Report generation failed - no report found")
     
     if report and "Report generation did not complete" not in report:
         logger.log_separator("Final Report")
@@ -246,12 +380,39 @@ def run_orchestrator_team(task: str, word_count: int = 500) -> str:
             report,
             "orchestrator",
             task,
-            logger.get_log_number()
+            logger.get_log_number(),
+            ledger=result.get("ledger")
         )
         logger.log("System", f"Report saved to: {report_file}")
     else:
         logger.log("System", "Report generation incomplete - check logs for issues")
     
+    if result.get("ledger"):
+        totals = result["ledger"].summary()["totals"]
+        logger.log("System", "Model usage", totals)
+    
     logger.log_separator("End of Execution")
     
-    return report
\ No newline at end of file
+    return report
+
+def run_orchestrator_team(task: str, word_count: int = 500) -> str:
+    """Run the orchestrator team on a given task."""
+    logger, graph, initial_state = start_orchestrator_run(task, word_count)
+    
+    try:
+        result = graph.invoke(initial_state)
+        return finish_orchestrator_run(task, logger, result)
+    finally:
+        # Delete the run's memory once the report has been read, or when the graph raised
+        finish_memory_namespace()
+
+async def arun_orchestrator_team(task: str, word_count: int = 500) -> str:
+    """Run the orchestrator team on a given task inside the current event loop."""
+    logger, graph, initial_state = start_orchestrator_run(task, word_count)
+    
+    try:
+        result = await graph.ainvoke(initial_state)
+        return finish_orchestrator_run(task, logger, result)
+    finally:
+        # Delete the run's memory once the report has been read, or when the graph raised
+        finish_memory_namespace()
\ No newline at end of file
@@ -6,7 +6,8 @@ import re
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.base_agent import BaseAgent
-from src.tools import RESEARCH_TOOLS
+from src.structured_output import DECISION_SCHEMA
+from src.tools import RESEARCH_TOOLS, split_search_results
 
 class ResearchAgent(BaseAgent):
     """Research agent for the orchestrator team using dynamic tool selection."""
@@ -15,6 +16,7 @@ class ResearchAgent(BaseAgent):
         super().__init__("Research Agent (Orchestrator Team)", RESEARCH_TOOLS)
         self.research_iterations = 0
         self.max_iterations = 8
+        self.max_actions_per_plan = 4  # Actions run per planning call before re-planning
         self.target_word_count = 500  # Will be updated from instruction
         self.min_findings_required = 6
     
@@ -32,6 +34,7 @@ class ResearchAgent(BaseAgent):
         Use your tools strategically:
         - First use create_outline tool to structure the research
         - Use web_search extensively with varied queries
+        - Use web_search_many to research several outline sections in one step (one query per section)
         - Use extract_facts to identify key information
         - Use save_to_memory to organize findings by section
         - Use format_citation for source tracking
@@ -54,20 +57,32 @@ class ResearchAgent(BaseAgent):
             context = self.build_research_context(instruction, findings, sections_covered, outline)
             action_plan = self.plan_next_action(messages, context)
             
-            if action_plan['action'] == 'respond':
-                findings.append({'type': 'insight', 'content': action_plan['input']})
-            else:
-                result = self.execute_tool(action_plan['action'], action_plan['input'])
-                findings.append({
-                    'tool': action_plan['action'],
-                    'query': action_plan.get('input', ''),
-                    'result': result,
-                    'reasoning': action_plan['reasoning']
-                })
-                
-                self.update_section_coverage(action_plan, sections_covered)
-                
-                messages.append(AIMessage(content=f"Research finding: {result[:200]}..."))
+            # Execute the planned actions in order
+            for step in action_plan['actions']:
+                if step['action'] == 'respond':
+                    findings.append({'type': 'insight', 'content': step['input']})
+                else:
+                    result = self.execute_action(step)
+                    if step['action'] == 'web_search_many':
+                        # One finding per query, as if each had been a separate web_search
+                        for query, query_result in split_search_results(result):
+                            findings.append({
+                                'tool': 'web_search',
+                                'query': query,
+                                'result': query_result,
+                                'reasoning': step['reasoning']
+                            })
+                    else:
+                        findings.append({
+                            'tool': step['action'],
+                            'query': step.get('input', ''),
+                            'result': result,
+                            'reasoning': step['reasoning']
+                        })
+                    
+                    self.update_section_coverage(step, sections_covered)
+                    
+                    messages.append(AIMessage(content=f"Research finding: {result[:200]}..."))
             
             self.research_iterations += 1
             
@@ -203,7 +218,11 @@ class ResearchAgent(BaseAgent):
         
         Answer: COMPLETE or CONTINUE"""
         
-        response = self.generate_response([], assessment_prompt)
+        response = self.generate_routed(
+            'is_research_complete', [], assessment_prompt,
+            lambda answer: 'COMPLETE' in answer.upper() or 'CONTINUE' in answer.upper(),
+            schema=DECISION_SCHEMA
+        )
         return "COMPLETE" in response.upper()
     
     def synthesize_research(self, findings: List, outline: str) -> str:
@@ -6,18 +6,33 @@ import re
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.base_agent import BaseAgent
-from src.tools import WRITER_TOOLS
+from src.shared_memory import MemoryWatch, get_shared_memory
+from src.structured_output import SCORE_SCHEMA
+from src.tools import MEMORY_READ_TOOLS, WRITER_TOOLS
 
 class WriterAgent(BaseAgent):
     """Writer agent for the orchestrator team using dynamic tool selection."""
     
+    # Key data to check for before writing
+    important_keys = [
+        'research_synthesis', 'research_summary',
+        'analysis_insights', 'key_insights',
+        'report_outline', 'consistency_report'
+    ]
+    
+    # Keys never used as section sources: the writer's own output, flags, and truncated copies of other keys
+    non_source_keys = {'final_report', 'report_outline', 'analysis_complete', 'research_summary', 'key_insights'}
+    
     def __init__(self):
         super().__init__("Writer Agent (Orchestrator Team)", WRITER_TOOLS)
         self.target_word_count = 500  # Default, will be updated
         self.minimum_word_count = 500  # Will match target
         self.writing_iterations = 0
         self.max_iterations = 5
+        self.max_actions_per_plan = 3  # Actions run per planning call before re-planning
         self.min_quality_score = 7
+        self.section_passages = 4  # Passages retrieved from memory per body section
+        self.data_watch = MemoryWatch(self.important_keys)
     
     def get_system_prompt(self) -> str:
         return """You are a Writer Agent working under an Orchestrator's guidance.
@@ -33,6 +48,7 @@ class WriterAgent(BaseAgent):
         
         Use your tools strategically:
         - Use read_from_memory to access all research and analysis
+        - Use search_memory to find the passages relevant to the section you are writing
         - Use create_outline to structure the report properly
         - Use word_count to track progress
         - Use save_to_memory to save the final report
@@ -56,19 +72,21 @@ class WriterAgent(BaseAgent):
             
             action_plan = self.plan_next_action(messages, context)
             
-            if action_plan['action'] == 'respond':
-                report_sections.append(action_plan['input'])
-            else:
-                result = self.execute_tool(action_plan['action'], action_plan['input'])
-                
-                if 'word_count' in action_plan['action'].lower():
-                    self.log(f"Current word count: {result}")
-                elif 'memory' in action_plan['action'].lower() and 'read' in action_plan['action'].lower():
-                    messages.append(AIMessage(content=f"Retrieved data: {result[:200]}..."))
-                elif 'outline' in action_plan['action'].lower():
-                    report_sections.append(f"Outline created: {result}")
+            # Execute the planned actions in order
+            for step in action_plan['actions']:
+                if step['action'] == 'respond':
+                    report_sections.append(step['input'])
                 else:
-                    messages.append(AIMessage(content=f"Tool result: {result[:100]}..."))
+                    result = self.execute_action(step)
+                    
+                    if 'word_count' in step['action'].lower():
+                        self.log(f"Current word count: {result}")
+                    elif step['action'] in MEMORY_READ_TOOLS:
+                        messages.append(AIMessage(content=f"Retrieved data: {result[:200]}..."))
+                    elif 'outline' in step['action'].lower():
+                        report_sections.append(f"Outline created: {result}")
+                    else:
+                        messages.append(AIMessage(content=f"Tool result: {result[:100]}..."))
             
             self.writing_iterations += 1
             
@@ -133,25 +151,12 @@ class WriterAgent(BaseAgent):
         return " | ".join(context_parts)
     
     def check_available_data(self) -> str:
-        """Check what data is available for writing."""
-        available = []
-        
-        # Key data to check for
-        important_keys = [
-            'research_synthesis', 'research_summary',
-            'analysis_insights', 'key_insights',
-            'report_outline', 'consistency_report'
-        ]
-        
-        # Use list_memory_keys if available
-        for tool in self.tools:
-            if 'list' in tool.name.lower() and 'memory' in tool.name.lower():
-                memory_keys = self.execute_tool(tool.name, '')
-                for key in important_keys:
-                    if key in memory_keys:
-                        available.append(key.replace('_', ' '))
-                break
-        
+        """Check what data is available for writing, re-reading memory only after one of the keys changed."""
+        return self.data_watch.cached(self.read_available_data)
+    
+    def read_available_data(self) -> str:
+        memory_keys = set(get_shared_memory().keys())
+        available = [key.replace('_', ' ') for key in self.important_keys if key in memory_keys]
         return ", ".join(available) if available else "Limited data available"
     
     def compile_full_report(self, sections: List[str]) -> str:
@@ -171,18 +176,10 @@ class WriterAgent(BaseAgent):
         return "\n\n".join(content_sections)
     
     def write_complete_report(self) -> str:
-        """Write a complete report using all available data."""
-        # Gather all necessary data
-        research_data = ""
-        analysis_data = ""
-        outline_data = ""
-        
-        for tool in self.tools:
-            if 'read' in tool.name.lower() and 'memory' in tool.name.lower():
-                research_data = self.execute_tool(tool.name, 'research_synthesis')
-                analysis_data = self.execute_tool(tool.name, 'analysis_insights')
-                outline_data = self.execute_tool(tool.name, 'report_outline')
-                break
+        """Write a complete report, giving each body section only the memory passages relevant to it."""
+        memory = get_shared_memory()
+        data = memory.get_many(['report_outline', 'key_insights'])
+        outline_data = data.get('report_outline', "No data found for key: report_outline")
         
         # Determine report structure
         num_body_sections = self.determine_body_sections()
@@ -197,6 +194,12 @@ class WriterAgent(BaseAgent):
         # Extract section topics from outline
         section_topics = self.extract_section_topics(outline_data, num_body_sections)
         
+        # Retrieve the most relevant passages for each section from the memory index
+        source_keys = [key for key in memory.keys() if key not in self.non_source_keys]
+        section_sources = {
+            topic: memory.search(topic, self.section_passages, keys=source_keys) for topic in section_topics
+        }
+        
         # Write the complete report
         write_prompt = f"""Write a COMPLETE professional report with the following structure:
         
@@ -217,6 +220,10 @@ class WriterAgent(BaseAgent):
            - Examples and evidence from research
            - Clear insights and implications
         """
+            if section_sources[topic]:
+                write_prompt += "   Sources for this section:\n" + "\n".join(
+                    f"           [{key}] {passage}" for key, passage, _ in section_sources[topic]
+                ) + "\n"
         
         write_prompt += f"""
         {num_body_sections + 3}. Conclusion ({conclusion_words} words)
@@ -225,11 +232,22 @@ class WriterAgent(BaseAgent):
            - Future outlook
         
         Total target: {self.target_word_count} words
+        """
         
+        if any(section_sources.values()):
+            write_prompt += f"""
+        Key insights (for the abstract, introduction and conclusion): {data.get('key_insights', 'No data found for key: key_insights')}
+        """
+        else:
+            # Nothing in the index matched the sections: fall back to the full research and analysis
+            full_data = memory.get_many(['research_synthesis', 'analysis_insights'])
+            write_prompt += f"""
         Use this data:
-        Research findings: {research_data}
-        Analysis insights: {analysis_data}
+        Research findings: {full_data.get('research_synthesis', 'No data found for key: research_synthesis')}
+        Analysis insights: {full_data.get('analysis_insights', 'No data found for key: analysis_insights')}
+        """
         
+        write_prompt += """
         CRITICAL: Write ACTUAL CONTENT with real information, not placeholders or outlines!
         Each section must contain substantive analysis and specific details."""
         
@@ -343,7 +361,11 @@ class WriterAgent(BaseAgent):
         
         Give ONLY a number 1-10. Be strict - only 7+ for truly complete, professional reports."""
         
-        response = self.generate_response([], quality_prompt)
+        response = self.generate_routed(
+            'assess_report_quality', [], quality_prompt,
+            lambda answer: re.search(r'\d+', answer) is not None,
+            schema=SCORE_SCHEMA
+        )
         
         try:
             score = int(re.search(r'\d+', response).group())
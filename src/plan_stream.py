@@ -0,0 +1,86 @@
+import json
+import re
+from typing import Callable, Optional
+
+
+class PlanStreamParser:
+    """
+    Incremental parser for ACTION/INPUT/REASONING planning responses.
+
+    Chunks are fed in as the model streams them. Fields are read line by line
+    exactly as BaseAgent.parse_action_plan reads them, and on_ready is called
+    with (action, input) as soon as each ACTION/INPUT pair is complete, while
+    the model may still be generating later steps or REASONING.
+    """
+
+    def __init__(self, on_ready: Optional[Callable[[str, str], None]] = None, max_steps: int = 1):
+        self.on_ready = on_ready
+        self.max_steps = max_steps
+        self.text = ""
+        self.steps = 0
+        self._action: Optional[str] = None
+        self._buffer = ""
+
+    def _handle_line(self, line: str):
+        line = line.strip()
+        if line.startswith('ACTION:'):
+            self._action = line.replace('ACTION:', '').strip()
+        elif line.startswith('INPUT:') and self._action is not None:
+            tool_input = line.replace('INPUT:', '').strip()
+            action, self._action = self._action, None
+            if self.steps < self.max_steps:
+                self.steps += 1
+                if self.on_ready:
+                    self.on_ready(action, tool_input)
+
+    def feed(self, chunk: str):
+        """Consume a streamed chunk, handling every line it completes."""
+        self.text += chunk
+        self._buffer += chunk
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            self._handle_line(line)
+
+    def close(self) -> str:
+        """Handle the final unterminated line and return the full response text."""
+        if self._buffer:
+            self._handle_line(self._buffer)
+            self._buffer = ""
+        return self.text
+
+
+class JsonPlanStreamParser:
+    """
+    Incremental parser for JSON planning responses (see src.structured_output.plan_schema).
+
+    Works like PlanStreamParser: on_ready is called with (action, input) as soon
+    as each {"action": ..., "input": ...} step object in the streamed text is
+    complete, before the rest of the plan and its reasoning have arrived.
+    """
+
+    STEP_PATTERN = re.compile(
+        r'\{\s*"action"\s*:\s*("(?:[^"\\]|\\.)*")\s*,\s*"input"\s*:\s*("(?:[^"\\]|\\.)*")\s*\}'
+    )
+
+    def __init__(self, on_ready: Optional[Callable[[str, str], None]] = None, max_steps: int = 1):
+        self.on_ready = on_ready
+        self.max_steps = max_steps
+        self.text = ""
+        self.steps = 0
+        self._position = 0
+
+    def feed(self, chunk: str):
+        """Consume a streamed chunk, handling every step object it completes."""
+        self.text += chunk
+        while self.steps < self.max_steps:
+            match = self.STEP_PATTERN.search(self.text, self._position)
+            if match is None:
+                return
+            self._position = match.end()
+            self.steps += 1
+            if self.on_ready:
+                self.on_ready(json.loads(match.group(1)).strip(), json.loads(match.group(2)).strip())
+
+    def close(self) -> str:
+        """Return the full response text."""
+        return self.text
\ No newline at end of file
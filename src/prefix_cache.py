@@ -0,0 +1,107 @@
+from concurrent.futures import Future
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rate_limiter import estimate_tokens
+
+
+class PrefixCache:
+    """
+    Registry of static prompt prefixes cached with the model provider.
+
+    Each agent's system prompt (and its planning template) is the same on every
+    call. The first call with a prefix registers it with the backend; later
+    calls on the same model send only the variable suffix along with the
+    returned handle. Handles are renewed shortly before their TTL runs out. A
+    prefix the provider refuses is remembered so it is not retried on every call.
+    Registration happens outside the registry lock: concurrent callers needing
+    the same prefix wait for the one registration in flight, and lookups of
+    other prefixes are never held up by it.
+    """
+
+    def __init__(self, ttl: float = 3600.0):
+        self.ttl = ttl
+        self._handles: Dict[Tuple[str, str, str], Tuple[Any, float]] = {}
+        self._refused: Dict[Tuple[str, str, str], float] = {}
+        self._pending: Dict[Tuple[str, str, str], Future] = {}  # Registrations in flight
+        self._lock = threading.Lock()
+        self.registrations = 0
+        self.hits = 0
+
+    @staticmethod
+    def _key(backend, prefix: str) -> Tuple[str, str, str]:
+        digest = hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+        return (type(backend).__name__, backend.model_name, digest)
+
+    def get_handle(self, backend, prefix: str) -> Optional[Any]:
+        """
+        Return a provider handle for the prefix, registering it if needed.
+
+        Returns:
+            The handle, or None if the backend cannot cache this prefix
+        """
+        if not prefix or not backend.supports_prefix_cache:
+            return None
+        if estimate_tokens(prefix) < backend.min_cached_tokens:
+            return None
+
+        key = self._key(backend, prefix)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            if self._refused.get(key, 0) > now:
+                return None
+            pending = self._pending.get(key)
+            registering = pending is None
+            if registering:
+                # Only one caller registers a prefix, so concurrent agents create one provider cache, not several
+                pending = self._pending[key] = Future()
+
+        if not registering:
+            return pending.result()
+
+        try:
+            handle = backend.cache_prefix(prefix, self.ttl)
+        except Exception:
+            handle = None
+        with self._lock:
+            if handle is None:
+                self._refused[key] = now + self.ttl
+            else:
+                # Renew a little before the provider expires the cache
+                self._handles[key] = (handle, now + self.ttl * 0.9)
+                self.registrations += 1
+            del self._pending[key]
+        pending.set_result(handle)
+        return handle
+
+    def invalidate(self, backend, prefix: str):
+        """Forget a handle the provider no longer accepts."""
+        with self._lock:
+            self._handles.pop(self._key(backend, prefix), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"prefixes": len(self._handles), "registrations": self.registrations, "hits": self.hits}
+
+
+_prefix_cache: Optional[PrefixCache] = None
+_prefix_cache_lock = threading.Lock()
+
+
+def get_prefix_cache() -> Optional[PrefixCache]:
+    """Return the process-wide prefix cache, or None if PREFIX_CACHE=0."""
+    global _prefix_cache
+    if os.getenv("PREFIX_CACHE", "1") == "0":
+        return None
+    with _prefix_cache_lock:
+        if _prefix_cache is None:
+            _prefix_cache = PrefixCache(ttl=float(os.getenv("PREFIX_CACHE_TTL", "3600")))
+        return _prefix_cache
\ No newline at end of file
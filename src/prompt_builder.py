@@ -0,0 +1,158 @@
+import os
+import threading
+from typing import Callable, List, Optional
+from langchain_core.messages import AnyMessage, HumanMessage, AIMessage
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rate_limiter import estimate_tokens
+from src.compaction import ConversationCompactor, Entry
+
+DEFAULT_HISTORY_TOKENS = int(os.getenv("PROMPT_HISTORY_TOKENS", "8000"))
+
+
+def render_message(msg: AnyMessage) -> str:
+    """Render one history message as a prompt line, or '' for message types the prompt omits."""
+    if isinstance(msg, HumanMessage):
+        return f"Human: {msg.content}\n"
+    elif isinstance(msg, AIMessage):
+        return f"Assistant: {msg.content}\n"
+    return ""
+
+
+def is_pinned(msg: AnyMessage) -> bool:
+    """Messages flagged with additional_kwargs['pinned'] always stay in the window."""
+    return bool(getattr(msg, 'additional_kwargs', {}).get('pinned'))
+
+
+class PromptBuilder:
+    """
+    Incremental prompt assembly with a bounded conversation window.
+
+    The agents keep appending to the same message list, so the builder remembers
+    the rendered lines (and their token counts) for the list it saw last and only
+    renders messages appended since. The history is then fitted to a token window:
+    the original task (first Human message) and any pinned messages are always
+    kept, and the oldest remaining messages are dropped first. With a compactor,
+    older messages are first folded into a rolling summary (see src.compaction),
+    so the window only has to trim as a last resort.
+    """
+
+    def __init__(self, max_history_tokens: Optional[int] = DEFAULT_HISTORY_TOKENS,
+                 pin_first_human: bool = True,
+                 count_tokens: Callable[[str], int] = estimate_tokens,
+                 compactor: Optional[ConversationCompactor] = None):
+        """
+        Initialize the builder.
+
+        Args:
+            max_history_tokens: Token budget for the rendered history, or None for unbounded
+            pin_first_human: Always keep the first Human message (the task)
+            count_tokens: Token counter applied to each rendered message
+            compactor: Summarizes older history before the window is applied
+        """
+        self.max_history_tokens = max_history_tokens
+        self.pin_first_human = pin_first_human
+        self.count_tokens = count_tokens
+        self.compactor = compactor
+        self._lock = threading.Lock()
+        self._system_prompt = None
+        self._system_prefix = ""
+        self._messages: List[AnyMessage] = []
+        self._lines: List[str] = []
+        self._tokens: List[int] = []
+        self._total_tokens = 0
+        self._history_text = ""
+
+    def _system(self, system_prompt: str) -> str:
+        if system_prompt != self._system_prompt:
+            self._system_prompt = system_prompt
+            self._system_prefix = f"{system_prompt}\n\n"
+        return self._system_prefix
+
+    def _sync_history(self, messages: List[AnyMessage]):
+        """Render messages appended since the last call, or start over if the history changed."""
+        cached = len(self._messages)
+        still_prefix = (
+            len(messages) >= cached
+            and (cached == 0 or (messages[0] is self._messages[0] and messages[cached - 1] is self._messages[cached - 1]))
+        )
+        if not still_prefix:
+            self._messages, self._lines, self._tokens, self._history_text = [], [], [], ""
+            self._total_tokens = 0
+            cached = 0
+
+        new_lines = []
+        for msg in messages[cached:]:
+            line = render_message(msg)
+            self._messages.append(msg)
+            self._lines.append(line)
+            self._tokens.append(self.count_tokens(line) if line else 0)
+            self._total_tokens += self._tokens[-1]
+            new_lines.append(line)
+        self._history_text += "".join(new_lines)
+
+    def _entries(self) -> List[Entry]:
+        """The cached history as (line, tokens, pinned) entries."""
+        first_human = None
+        if self.pin_first_human:
+            first_human = next((i for i, msg in enumerate(self._messages) if isinstance(msg, HumanMessage)), None)
+        return [
+            (line, tokens, i == first_human or is_pinned(msg))
+            for i, (msg, line, tokens) in enumerate(zip(self._messages, self._lines, self._tokens))
+        ]
+
+    def _windowed_history(self, entries: Optional[List[Entry]] = None) -> str:
+        """Fit the rendered history (or the given entries) to the token window."""
+        if entries is None:
+            if self.max_history_tokens is None or self._total_tokens <= self.max_history_tokens:
+                return self._history_text
+            entries = self._entries()
+        elif self.max_history_tokens is None or sum(e[1] for e in entries) <= self.max_history_tokens:
+            return "".join(e[0] for e in entries)
+
+        pinned = {i for i, (_, _, is_pin) in enumerate(entries) if is_pin}
+        budget = self.max_history_tokens - sum(entries[i][1] for i in pinned)
+        keep = set(pinned)
+        # Walk back from the newest message, keeping as many as fit
+        for i in range(len(entries) - 1, -1, -1):
+            if i in pinned:
+                continue
+            if entries[i][1] > budget:
+                break
+            budget -= entries[i][1]
+            keep.add(i)
+
+        omitted = len([i for i in range(len(entries)) if i not in keep and entries[i][0]])
+        parts = []
+        note_added = False
+        for i, (line, _, _) in enumerate(entries):
+            if i in keep:
+                parts.append(line)
+            elif not note_added and omitted:
+                parts.append(f"[{omitted} earlier messages omitted]\n")
+                note_added = True
+        return "".join(parts)
+
+    def prefix(self, system_prompt: str, static_prompt: str = "") -> str:
+        """The static start of every prompt: the system prompt, then an optional static instruction block."""
+        with self._lock:
+            prefix = self._system(system_prompt)
+        if static_prompt:
+            prefix += f"{static_prompt}\n\n"
+        return prefix
+
+    def build(self, system_prompt: str, messages: List[AnyMessage], additional_prompt: str = "") -> str:
+        """Combine the system prompt, additional prompt and (windowed) message history."""
+        with self._lock:
+            full_prompt = self._system(system_prompt)
+
+            if additional_prompt:
+                full_prompt += f"{additional_prompt}\n\n"
+
+            if not messages:
+                return full_prompt
+
+            self._sync_history(messages)
+            if self.compactor is not None:
+                return full_prompt + self._windowed_history(self.compactor.compact(self._entries()))
+            return full_prompt + self._windowed_history()
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Published free-tier limits as (requests per minute, tokens per minute).
+# Models not listed here fall back to DEFAULT_RATE_LIMIT.
+MODEL_RATE_LIMITS: Dict[str, Tuple[int, Optional[int]]] = {
+    'gemini-2.0-flash-lite': (30, 1000000),
+    'gemini-2.0-flash': (15, 1000000),
+    'gemini-1.5-flash': (15, 250000),
+    'gemini-1.5-flash-8b': (15, 250000),
+}
+DEFAULT_RATE_LIMIT: Tuple[int, Optional[int]] = (15, 250000)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for rate limiting."""
+    return len(text) // 4 + 1
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests-per-minute and tokens-per-minute.
+
+    Callers reserve capacity up front: the buckets are debited immediately and
+    may go negative, and each caller is told how long to wait for the debt it
+    created to be repaid. Because reservations are made under a single lock,
+    waiting callers are served strictly in arrival order, and calls go through
+    with no delay at all while there is headroom.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: Optional[int] = None):
+        """
+        Initialize the limiter with full buckets.
+
+        Args:
+            requests_per_minute: Maximum requests per rolling minute
+            tokens_per_minute: Maximum prompt tokens per rolling minute, or None for no token limit
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_balance = float(requests_per_minute)
+        self._token_balance = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Credit both buckets for the time elapsed since the last refill."""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_balance = min(
+            float(self.requests_per_minute),
+            self._request_balance + elapsed * self.requests_per_minute / 60.0
+        )
+        if self.tokens_per_minute:
+            self._token_balance = min(
+                float(self.tokens_per_minute),
+                self._token_balance + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Reserve capacity for one request and return how long to wait before sending it.
+
+        Args:
+            tokens: Estimated tokens the request will consume
+
+        Returns:
+            Seconds the caller must wait (0.0 when there is headroom)
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+
+            wait = 0.0
+            self._request_balance -= 1
+            if self._request_balance < 0:
+                wait = -self._request_balance * 60.0 / self.requests_per_minute
+
+            if self.tokens_per_minute:
+                # A single oversized request can never exceed a full bucket
+                self._token_balance -= min(tokens, self.tokens_per_minute)
+                if self._token_balance < 0:
+                    wait = max(wait, -self._token_balance * 60.0 / self.tokens_per_minute)
+
+            return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request of the given size may be sent. Returns the time waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """Wait without blocking the event loop until a request may be sent. Returns the time waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_rate_limit(model_name: str, requests_per_minute: int, tokens_per_minute: Optional[int] = None):
+    """Set the limits for a model, replacing any limiter already created for it."""
+    with _limiters_lock:
+        MODEL_RATE_LIMITS[model_name] = (requests_per_minute, tokens_per_minute)
+        _limiters.pop(model_name, None)
+
+
+def get_rate_limiter(model_name: str) -> RateLimiter:
+    """
+    Get the process-wide limiter for a model.
+
+    Every agent using the same model shares one limiter, so concurrent runs in a
+    process stay within the API key's quota together. The RATE_LIMIT_RPM and
+    RATE_LIMIT_TPM environment variables override the per-model defaults.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            rpm, tpm = MODEL_RATE_LIMITS.get(model_name, DEFAULT_RATE_LIMIT)
+            if os.getenv("RATE_LIMIT_RPM"):
+                rpm = int(os.getenv("RATE_LIMIT_RPM"))
+            if os.getenv("RATE_LIMIT_TPM"):
+                tpm = int(os.getenv("RATE_LIMIT_TPM"))
+            limiter = RateLimiter(rpm, tpm)
+            _limiters[model_name] = limiter
+        return limiter
@@ -0,0 +1,268 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class ModelCallError(Exception):
+    """Base class for model calls that failed after the resilience layer gave up."""
+
+    def __init__(self, message: str, model_name: str = "", cause: Optional[BaseException] = None):
+        super().__init__(message)
+        self.model_name = model_name
+        self.cause = cause
+
+
+class TransientModelError(ModelCallError):
+    """The model kept failing with retryable errors (rate limits, timeouts, 5xx) until retries ran out."""
+
+
+class ModelRequestError(ModelCallError):
+    """The model rejected the request with a non-retryable error (bad request, auth, missing key)."""
+
+
+class ModelUnavailableError(ModelCallError):
+    """The model's circuit breaker is open, so the call was not attempted."""
+
+
+class ModelDeadlineExceeded(ModelCallError):
+    """The call did not succeed within its overall deadline, including retries."""
+
+
+# Exception class names raised by google.api_core / the Gemini SDK that are worth retrying.
+# Matched by name so the resilience layer does not import the SDK.
+TRANSIENT_ERROR_NAMES = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+    'DeadlineExceeded', 'GatewayTimeout', 'Aborted', 'RetryError'
+}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Return True if an error from a backend is worth retrying."""
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+
+class RetryPolicy:
+    """Retry schedule: exponential backoff with full jitter, bounded by a per-call deadline."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 1.0, max_delay: float = 20.0,
+                 deadline: Optional[float] = 120.0):
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts: Total attempts including the first
+            base_delay: Backoff before the first retry, doubled on each further retry
+            max_delay: Upper bound on a single backoff
+            deadline: Seconds allowed for the whole call including retries, or None for no deadline
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait after the given (zero-based) failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls fail
+    fast with ModelUnavailableError. Once reset_timeout has passed a single trial
+    call is let through; its success closes the circuit, its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Return True if a call may be attempted now."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._trial_in_flight or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """Give back a half-open trial that ended without a result (deadline, cancellation)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(model_name: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker for a model."""
+    with _breakers_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker()
+        return _breakers[model_name]
+
+
+def _remaining(deadline_at: Optional[float]) -> Optional[float]:
+    return None if deadline_at is None else deadline_at - time.monotonic()
+
+
+def call_with_resilience(attempt: Callable[[Optional[float]], Any], model_name: str,
+                         policy: Optional[RetryPolicy] = None,
+                         on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+                         acquire: Optional[Callable[[], Any]] = None) -> Any:
+    """
+    Run a model call with retries, backoff, circuit breaking and a deadline.
+
+    Args:
+        attempt: Makes one attempt; receives the seconds left before the deadline (or None)
+        model_name: Model whose circuit breaker guards the call
+        policy: Retry policy, defaults to RetryPolicy()
+        on_retry: Called with (attempt number, error, backoff seconds) before each retry
+        acquire: Called before each attempt to wait for rate-limit capacity; the
+            time it takes counts against the deadline, not against the attempt
+
+    Returns:
+        Whatever attempt returns on success
+
+    Raises:
+        ModelCallError: A subclass describing why the call ultimately failed
+    """
+    policy = policy or RetryPolicy()
+    breaker = get_circuit_breaker(model_name)
+    deadline_at = time.monotonic() + policy.deadline if policy.deadline else None
+    last_error: Optional[BaseException] = None
+
+    for attempt_number in range(policy.max_attempts):
+        if not breaker.allow():
+            raise ModelUnavailableError(f"Circuit open for {model_name}", model_name, last_error)
+
+        # Any exit before the outcome is recorded (deadline, cancellation) hands the trial back
+        recorded = False
+        try:
+            if acquire:
+                acquire()
+            remaining = _remaining(deadline_at)
+            if remaining is not None and remaining <= 0:
+                raise ModelDeadlineExceeded(f"Deadline of {policy.deadline}s exceeded for {model_name}", model_name, last_error)
+
+            try:
+                result = attempt(remaining)
+            except Exception as e:
+                breaker.record_failure()
+                recorded = True
+                last_error = e
+                if not is_transient_error(e):
+                    raise ModelRequestError(f"{type(e).__name__}: {e}", model_name, e) from e
+                if attempt_number == policy.max_attempts - 1:
+                    break
+
+                delay = policy.backoff(attempt_number)
+                remaining = _remaining(deadline_at)
+                if remaining is not None and delay >= remaining:
+                    raise ModelDeadlineExceeded(f"Deadline of {policy.deadline}s exceeded for {model_name}", model_name, e) from e
+                if on_retry:
+                    on_retry(attempt_number + 1, e, delay)
+                time.sleep(delay)
+                continue
+
+            breaker.record_success()
+            recorded = True
+            return result
+        finally:
+            if not recorded:
+                breaker.release()
+
+    raise TransientModelError(
+        f"{model_name} failed after {policy.max_attempts} attempts: {type(last_error).__name__}: {last_error}",
+        model_name, last_error
+    )
+
+
+async def acall_with_resilience(attempt: Callable[[Optional[float]], Awaitable[Any]], model_name: str,
+                                policy: Optional[RetryPolicy] = None,
+                                on_retry: Optional[Callable[[int, BaseException, float], None]] = None,
+                                acquire: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+    """Async counterpart of call_with_resilience; each attempt is cancelled at the deadline."""
+    policy = policy or RetryPolicy()
+    breaker = get_circuit_breaker(model_name)
+    deadline_at = time.monotonic() + policy.deadline if policy.deadline else None
+    last_error: Optional[BaseException] = None
+
+    for attempt_number in range(policy.max_attempts):
+        if not breaker.allow():
+            raise ModelUnavailableError(f"Circuit open for {model_name}", model_name, last_error)
+
+        # Any exit before the outcome is recorded (deadline, cancellation) hands the trial back
+        recorded = False
+        try:
+            if acquire:
+                await acquire()
+            remaining = _remaining(deadline_at)
+            if remaining is not None and remaining <= 0:
+                raise ModelDeadlineExceeded(f"Deadline of {policy.deadline}s exceeded for {model_name}", model_name, last_error)
+
+            try:
+                result = await asyncio.wait_for(attempt(remaining), timeout=remaining)
+            except Exception as e:
+                breaker.record_failure()
+                recorded = True
+                last_error = e
+                if not is_transient_error(e):
+                    raise ModelRequestError(f"{type(e).__name__}: {e}", model_name, e) from e
+                if attempt_number == policy.max_attempts - 1:
+                    break
+
+                delay = policy.backoff(attempt_number)
+                remaining = _remaining(deadline_at)
+                if remaining is not None and delay >= remaining:
+                    raise ModelDeadlineExceeded(f"Deadline of {policy.deadline}s exceeded for {model_name}", model_name, e) from e
+                if on_retry:
+                    on_retry(attempt_number + 1, e, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            recorded = True
+            return result
+        finally:
+            if not recorded:
+                breaker.release()
+
+    raise TransientModelError(
+        f"{model_name} failed after {policy.max_attempts} attempts: {type(last_error).__name__}: {last_error}",
+        model_name, last_error
+    )
@@ -0,0 +1,132 @@
+"""
+Run both teams end-to-end against the offline stub model backend.
+Usage: python run_benchmark.py [--latency SECONDS] [--search-latency SECONDS] [--team orchestrator|swarm|both]
+
+Set STRUCTURED_OUTPUT=0 to compare against free-text planning, or
+SEMANTIC_CACHE=1 (optionally SEMANTIC_CACHE_AUDIT_RATE) to measure near-duplicate reuse.
+
+Web searches are answered from a local corpus (--corpus, default the sample in
+src/data) with a fixed delay per query, so search-heavy runs time the same way
+every time. Each research agent's first plan is scripted to search the corpus.
+No network access or API key is needed, so the graphs can be profiled and
+load-tested on an isolated machine.
+"""
+import argparse
+import json
+import re
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.model_backends import StubBackend, default_stub_responder, set_backend_factory
+from src.search_backends import DEFAULT_CORPUS_PATH, LocalCorpusBackend, set_search_backend
+from src.shared_memory import finish_memory_namespace
+
+# Aspects of the task the scripted research plan searches for, one query each
+SEARCH_ASPECTS = ["current state", "key trends", "challenges and opportunities", "future outlook"]
+
+
+def search_first_responder(task: str):
+    """
+    Stub responder that has each research agent search before anything else.
+
+    A research agent's first planning prompt (the one offering web_search_many
+    at iteration 1) is answered with one web_search_many over aspects of the
+    task; every other prompt gets default_stub_responder's reply. Runs
+    therefore spend time in the search backend the way real research does.
+    """
+    queries = "; ".join(f"{task} {aspect}" for aspect in SEARCH_ASPECTS)
+    reasoning = "Gathering sources before writing anything."
+
+    def respond(prompt: str) -> str:
+        if "- web_search_many:" in prompt and re.search(r'Iteration: 1(?!\d)', prompt):
+            if "Respond with ONLY a JSON object" in prompt:
+                return json.dumps({"actions": [{"action": "web_search_many", "input": queries}],
+                                   "reasoning": reasoning})
+            if "Respond in EXACTLY this format" in prompt:
+                return f"ACTION: web_search_many\nINPUT: {queries}\nREASONING: {reasoning}"
+        return default_stub_responder(prompt)
+
+    return respond
+
+
+def run_team(team: str, task: str, word_count: int) -> dict:
+    """Run one team and return its wall-clock time and usage totals."""
+    if team == "orchestrator":
+        from src.orchestrator.orchestrator_graph import start_orchestrator_run as start, finish_orchestrator_run as finish
+    else:
+        from src.swarm.swarm_graph import start_swarm_run as start, finish_swarm_run as finish
+
+    start_time = time.perf_counter()
+    logger, graph, initial_state = start(task, word_count)
+    try:
+        result = graph.invoke(initial_state)
+        finish(task, logger, result)
+    finally:
+        finish_memory_namespace()
+    elapsed = time.perf_counter() - start_time
+
+    summary = result["ledger"].summary()
+    return {"elapsed": elapsed, "totals": summary["totals"], "events": summary["events"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark for the orchestrator and swarm teams")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per model call")
+    parser.add_argument("--latency-per-token", type=float, default=0.0, help="Simulated seconds per output token")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Simulated seconds per web search")
+    parser.add_argument("--search-jitter", type=float, default=0.0,
+                        help="Extra simulated seconds per web search, up to this much, fixed per query")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_PATH, help="JSONL corpus web searches are answered from")
+    parser.add_argument("--team", choices=["orchestrator", "swarm", "both"], default="both")
+    parser.add_argument("--task", default="renewable energy trends in 2024")
+    parser.add_argument("--word-count", type=int, default=1000)
+    args = parser.parse_args()
+
+    responder = search_first_responder(args.task)
+    set_backend_factory(lambda model_name: StubBackend(
+        model_name,
+        responder=responder,
+        latency=args.latency,
+        latency_per_token=args.latency_per_token
+    ))
+    search_backend = LocalCorpusBackend(args.corpus, latency=args.search_latency, jitter=args.search_jitter)
+    set_search_backend(search_backend)
+
+    teams = ["orchestrator", "swarm"] if args.team == "both" else [args.team]
+
+    print("Running offline benchmark (stub model backend)")
+    print(f"Task: {args.task}")
+    print(f"Simulated latency: {args.latency}s per call, {args.latency_per_token}s per token, "
+          f"{args.search_latency}s (+{args.search_jitter}s jitter) per search")
+    print("="*60)
+
+    for team in teams:
+        stats = run_team(team, args.task, args.word_count)
+        totals = stats["totals"]
+        print(f"{team.capitalize()} team: {stats['elapsed']:.2f}s wall, "
+              f"{totals['api_calls']} API calls, "
+              f"{totals['input_tokens']} input / {totals['output_tokens']} output tokens "
+              f"(+{totals['cached_input_tokens']} cached), "
+              f"{totals['latency']:.2f}s model latency, {totals['queue_wait']:.2f}s queue wait")
+        events = stats["events"]
+        print(f"  {events.get('plan_parse_failures', 0)} wasted planning iterations, "
+              f"{events.get('structured_parse_errors', 0)} invalid structured responses "
+              f"({events.get('structured_repairs', 0)} repaired)")
+
+    print(f"Searches: {search_backend.searches} against {len(search_backend.documents)} corpus documents")
+
+    from src.semantic_cache import get_semantic_cache
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        stats = semantic_cache.stats()
+        print(f"Semantic cache: {stats['hits']}/{stats['lookups']} hits ({stats['hit_rate']:.0%}), "
+              f"mean prompt divergence {stats['mean_prompt_divergence']:.3f}, "
+              f"mean response divergence {stats['mean_response_divergence']:.3f} over {stats['audits']} audits")
+
+    from src.cache import get_search_cache
+    search_cache = get_search_cache()
+    if search_cache is not None and search_cache.hits + search_cache.misses:
+        stats = search_cache.stats()
+        print(f"Search cache: {stats['hits']}/{stats['hits'] + stats['misses']} hits ({stats['hit_rate']:.0%}), "
+              f"{stats['expired']} expired, {stats['entries']} entries")
@@ -0,0 +1,167 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Union
+import hashlib
+import json
+import os
+import threading
+import time
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.memory_index import BM25Index
+
+# Sample corpus shipped for offline runs
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "search_corpus.jsonl")
+
+
+class SearchBackend(ABC):
+    """Interface between the search tools and a source of search results."""
+
+    name = "search"  # Identifies the source, e.g. in search cache keys
+    cacheable = True  # Whether results are worth keeping in the search cache
+
+    @abstractmethod
+    def search(self, query: str) -> str:
+        """
+        Return search results for a query as text.
+
+        Raises:
+            Exception: If the search fails; the tools report it as a search error
+        """
+
+
+class DuckDuckGoBackend(SearchBackend):
+    """Live web search through DuckDuckGo. The client is created on first search."""
+
+    name = "duckduckgo"
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def search(self, query: str) -> str:
+        with self._lock:
+            if self._client is None:
+                from langchain_community.tools import DuckDuckGoSearchRun
+                self._client = DuckDuckGoSearchRun()
+        return self._client.invoke(query)
+
+
+class LocalCorpusBackend(SearchBackend):
+    """
+    Offline search over a JSONL corpus on disk.
+
+    Each line is a document with a "text" field and optional "title" and "url".
+    Documents are indexed with BM25 when the backend is created. A search
+    returns the best passages of the top documents, formatted like web
+    snippets. Each search sleeps for a configurable latency plus jitter that
+    depends only on the query, so timed runs are reproducible. Results skip
+    the search cache: they are already local, and caching would hide the
+    injected latency.
+    """
+
+    cacheable = False
+
+    def __init__(self, path: str = DEFAULT_CORPUS_PATH, results: int = 3,
+                 latency: float = 0.0, jitter: float = 0.0):
+        """
+        Load and index a corpus.
+
+        Args:
+            path: JSONL file with one document per line
+            results: Documents returned per search
+            latency: Seconds each search takes at least
+            jitter: Extra seconds, up to this much, added per query
+        """
+        self.path = path
+        self.name = f"local:{os.path.abspath(path)}"
+        self.results = results
+        self.latency = latency
+        self.jitter = jitter
+        self.searches = 0
+        self._lock = threading.Lock()
+        self.documents: List[Dict[str, Any]] = []
+        self.index = BM25Index(passage_words=80)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                document = json.loads(line)
+                doc_id = str(len(self.documents))
+                self.documents.append(document)
+                self.index.add(doc_id, f"{document.get('title', '')}\n\n{document.get('text', '')}")
+
+    def delay(self, query: str) -> float:
+        """Simulated seconds a search for this query takes."""
+        fraction = int.from_bytes(hashlib.sha256(query.encode('utf-8')).digest()[:4], 'big') / 2 ** 32
+        return self.latency + self.jitter * fraction
+
+    def search(self, query: str) -> str:
+        time.sleep(self.delay(query))
+        with self._lock:
+            self.searches += 1
+
+        # Keep the best passage of each of the top documents
+        snippets, seen = [], set()
+        for doc_id, passage, _ in self.index.search(query, k=self.results * 4):
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            document = self.documents[int(doc_id)]
+            title = document.get('title', 'Untitled')
+            if passage.startswith(title):
+                passage = passage[len(title):].strip()
+            snippet = f"{title}: {passage}"
+            if document.get('url'):
+                snippet += f" (Source: {document['url']})"
+            snippets.append(snippet)
+            if len(snippets) == self.results:
+                break
+        return "\n\n".join(snippets) if snippets else "No good search results were found."
+
+
+_search_backend: Optional[SearchBackend] = None
+_search_backend_lock = threading.Lock()
+
+
+def set_search_backend(backend: Optional[Union[SearchBackend, str]]):
+    """
+    Choose the backend the search tools use.
+
+    Args:
+        backend: A SearchBackend, 'duckduckgo', 'local', or None to restore the
+            default (SEARCH_BACKEND environment variable, else DuckDuckGo)
+    """
+    global _search_backend
+    if isinstance(backend, str):
+        backend = create_search_backend(backend)
+    with _search_backend_lock:
+        _search_backend = backend
+
+
+def create_search_backend(name: str) -> SearchBackend:
+    """
+    Create a search backend by name.
+
+    'local' reads SEARCH_CORPUS (default: the sample corpus), SEARCH_RESULTS,
+    SEARCH_LATENCY and SEARCH_LATENCY_JITTER.
+    """
+    if name == "duckduckgo":
+        return DuckDuckGoBackend()
+    if name == "local":
+        return LocalCorpusBackend(
+            os.getenv("SEARCH_CORPUS", DEFAULT_CORPUS_PATH),
+            results=int(os.getenv("SEARCH_RESULTS", "3")),
+            latency=float(os.getenv("SEARCH_LATENCY", "0")),
+            jitter=float(os.getenv("SEARCH_LATENCY_JITTER", "0"))
+        )
+    raise ValueError(f"Unknown search backend: {name}")
+
+
+def get_search_backend() -> SearchBackend:
+    """Return the backend the search tools use, creating the configured one on first use."""
+    global _search_backend
+    with _search_backend_lock:
+        if _search_backend is None:
+            _search_backend = create_search_backend(os.getenv("SEARCH_BACKEND", "duckduckgo").lower())
+        return _search_backend
\ No newline at end of file
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Fields that change between otherwise identical prompts, replaced before hashing
+VOLATILE_PATTERNS: List[Tuple[str, str]] = [
+    (r'(iteration:\s*)\d+\s*/\s*\d+', r'\1#/#'),  # "Iteration: 3/8" in the agents' planning contexts
+    (r'\b\d{1,2}:\d{2}:\d{2}\b', '#:#:#'),  # Log timestamps
+]
+
+# Call sites never served approximately: their answers flip on small prompt changes
+# (counts, scores) or must match exactly the output they repair.
+DEFAULT_EXCLUDED_CALL_SITES = {
+    "determine_next_agent_dynamically",
+    "is_research_complete",
+    "assess_research_completeness",
+    "is_analysis_complete",
+    "assess_report_quality",
+    "final_quality_assessment",
+    "repair_structured_output",
+}
+
+_PRIME = 4294967291  # Largest prime below 2**32, so (a * h + b) fits in 64 bits for 32-bit h
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lower-case a prompt, mask volatile fields and collapse whitespace."""
+    text = prompt.lower()
+    for pattern, replacement in VOLATILE_PATTERNS:
+        text = re.sub(pattern, replacement, text)
+    return ' '.join(text.split())
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles, estimating Jaccard similarity between texts.
+
+    Signatures of recently seen texts are memoized, since every prompt is signed
+    once on lookup and again when its response is stored.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1, memo_size: int = 256):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.memo_size = memo_size
+        rng = random.Random(seed)
+        self._a = [rng.randrange(1, _PRIME) for _ in range(num_perm)]
+        self._b = [rng.randrange(0, _PRIME) for _ in range(num_perm)]
+        self._memo: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def shingles(self, text: str) -> Set[int]:
+        """Hash each run of shingle_size consecutive words to a 32-bit integer."""
+        words = text.split()
+        size = min(self.shingle_size, len(words)) or 1
+        return {
+            int.from_bytes(hashlib.blake2b(' '.join(words[i:i + size]).encode('utf-8'), digest_size=4).digest(), 'big')
+            for i in range(max(len(words) - size + 1, 1))
+        }
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        with self._memo_lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+
+        import numpy as np  # Only needed once the semantic cache is enabled
+        hashes = np.fromiter(self.shingles(text), dtype=np.uint64)
+        a = np.array(self._a, dtype=np.uint64)[:, None]
+        b = np.array(self._b, dtype=np.uint64)[:, None]
+        signature = tuple(int(value) for value in ((a * hashes + b) % np.uint64(_PRIME)).min(axis=1))
+
+        with self._memo_lock:
+            self._memo[key] = signature
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return signature
+
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+        return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+class SemanticCache:
+    """
+    Approximate, in-memory cache of LLM responses for near-duplicate prompts.
+
+    Prompts are normalized (see VOLATILE_PATTERNS) and reduced to MinHash
+    signatures. Locality-sensitive hashing over bands of each signature finds
+    candidate entries without comparing against every cached prompt; the best
+    candidate is reused if its estimated similarity reaches the threshold.
+    Entries are only matched within the same model, generation parameters and
+    call site. The exact ResponseCache is always consulted first.
+
+    Metrics:
+        hit_rate: share of lookups served approximately
+        mean_prompt_divergence: average 1 - similarity of the prompts reused on a hit
+        mean_response_divergence: on audited hits (see audit_rate), average
+            1 - similarity between the cached response and a fresh one
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16,
+                 max_entries: int = 2000, audit_rate: float = 0.0,
+                 excluded_call_sites: Optional[Set[str]] = None):
+        """
+        Args:
+            threshold: Minimum estimated Jaccard similarity to reuse a response
+            num_perm: MinHash permutations per signature
+            bands: LSH bands; num_perm must be divisible by it
+            max_entries: Entries kept, least recently used evicted first
+            audit_rate: Fraction of hits still sent to the model to measure response divergence
+            excluded_call_sites: Call sites never served from this cache
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries = max_entries
+        self.audit_rate = audit_rate
+        self.excluded_call_sites = set(DEFAULT_EXCLUDED_CALL_SITES if excluded_call_sites is None
+                                       else excluded_call_sites)
+        self.hasher = MinHasher(num_perm)
+        self._entries: "OrderedDict[int, Tuple[str, Tuple[int, ...], str]]" = OrderedDict()  # id -> (namespace, signature, response)
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], Set[int]] = defaultdict(set)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.lookups = 0
+        self.hits = 0
+        self.skipped = 0
+        self._prompt_divergence = 0.0
+        self.audits = 0
+        self._response_divergence = 0.0
+        self.max_response_divergence = 0.0
+
+    def enabled_for(self, call_site: Optional[str]) -> bool:
+        return (call_site or "generate_response") not in self.excluded_call_sites
+
+    @staticmethod
+    def _namespace(model_name: str, params: Optional[Dict[str, Any]], call_site: Optional[str]) -> str:
+        return json.dumps([model_name, params or {}, call_site or "generate_response"], sort_keys=True)
+
+    def _band_keys(self, namespace: str, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield (namespace, band, signature[band * self.rows:(band + 1) * self.rows])
+
+    def lookup(self, model_name: str, prompt: str, params: Optional[Dict[str, Any]] = None,
+               call_site: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """
+        Find a response cached for a near-duplicate prompt.
+
+        Returns:
+            (response, similarity) for the most similar entry at or above the threshold, or None
+        """
+        if not self.enabled_for(call_site):
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        namespace = self._namespace(model_name, params, call_site)
+        signature = self.hasher.signature(normalize_prompt(prompt))
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for key in self._band_keys(namespace, signature):
+                candidates.update(self._buckets.get(key, ()))
+
+            best_id, best_similarity = None, 0.0
+            for entry_id in candidates:
+                similarity = MinHasher.similarity(signature, self._entries[entry_id][1])
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None or best_similarity < self.threshold:
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            self._prompt_divergence += 1.0 - best_similarity
+            return self._entries[best_id][2], best_similarity
+
+    def put(self, model_name: str, prompt: str, response: str, params: Optional[Dict[str, Any]] = None,
+            call_site: Optional[str] = None):
+        """Cache a response for later near-duplicate prompts."""
+        if not self.enabled_for(call_site):
+            return
+        namespace = self._namespace(model_name, params, call_site)
+        signature = self.hasher.signature(normalize_prompt(prompt))
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (namespace, signature, response)
+            for key in self._band_keys(namespace, signature):
+                self._buckets[key].add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                oldest_id, (old_namespace, old_signature, _) = self._entries.popitem(last=False)
+                for key in self._band_keys(old_namespace, old_signature):
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(oldest_id)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def should_audit(self) -> bool:
+        """Decide whether a hit should still be sent to the model to measure divergence."""
+        return self.audit_rate > 0 and self._random.random() < self.audit_rate
+
+    def record_audit(self, cached_response: str, fresh_response: str):
+        """Record how far a reused response was from the one the model actually gave."""
+        divergence = 1.0 - MinHasher.similarity(
+            self.hasher.signature(normalize_prompt(cached_response)),
+            self.hasher.signature(normalize_prompt(fresh_response))
+        )
+        with self._lock:
+            self.audits += 1
+            self._response_divergence += divergence
+            self.max_response_divergence = max(self.max_response_divergence, divergence)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                "skipped": self.skipped,
+                "entries": len(self._entries),
+                "mean_prompt_divergence": round(self._prompt_divergence / self.hits, 4) if self.hits else 0.0,
+                "audits": self.audits,
+                "mean_response_divergence": round(self._response_divergence / self.audits, 4) if self.audits else 0.0,
+                "max_response_divergence": round(self.max_response_divergence, 4)
+            }
+
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def enable_semantic_cache(threshold: float = 0.9, audit_rate: float = 0.0,
+                          excluded_call_sites: Optional[Set[str]] = None, **kwargs) -> SemanticCache:
+    """Turn on the process-wide semantic cache used by every agent."""
+    global _semantic_cache
+    with _semantic_cache_lock:
+        _semantic_cache = SemanticCache(threshold=threshold, audit_rate=audit_rate,
+                                        excluded_call_sites=excluded_call_sites, **kwargs)
+        return _semantic_cache
+
+
+def disable_semantic_cache():
+    """Turn off the process-wide semantic cache."""
+    global _semantic_cache
+    with _semantic_cache_lock:
+        _semantic_cache = None
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Get the process-wide semantic cache, or None if it is off.
+
+    The cache is opt-in because it returns approximate answers: call
+    enable_semantic_cache() or set SEMANTIC_CACHE=1. SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_AUDIT_RATE and SEMANTIC_CACHE_EXCLUDE (comma-separated call
+    sites, added to DEFAULT_EXCLUDED_CALL_SITES) configure it.
+    """
+    if _semantic_cache is None and os.getenv("SEMANTIC_CACHE", "0") == "1":
+        excluded = DEFAULT_EXCLUDED_CALL_SITES | {
+            site.strip() for site in os.getenv("SEMANTIC_CACHE_EXCLUDE", "").split(',') if site.strip()
+        }
+        enable_semantic_cache(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+            audit_rate=float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0")),
+            excluded_call_sites=excluded
+        )
+    return _semantic_cache
\ No newline at end of file
@@ -0,0 +1,697 @@
+import atexit
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.memory_index import BM25Index
+
+# Where shared memory lives: "sqlite" (default, safe for concurrent runs and processes) or "json"
+SHARED_MEMORY_BACKEND = os.getenv("SHARED_MEMORY_BACKEND", "sqlite")
+
+# Database / file the shared memory is persisted to, relative to the working directory
+SHARED_MEMORY_PATH = os.getenv("SHARED_MEMORY_PATH", "")
+
+# JSON backend: seconds a save may wait before it is written to disk; saves within the window share one write
+SHARED_MEMORY_FLUSH_INTERVAL = float(os.getenv("SHARED_MEMORY_FLUSH_INTERVAL", "0.5"))
+
+# SQLite backend: characters per stored chunk of a value, so partial reads fetch only the chunks they cover
+SHARED_MEMORY_CHUNK_SIZE = int(os.getenv("SHARED_MEMORY_CHUNK_SIZE", "4096"))
+
+# SQLite backend: bytes of the database file read through a memory map instead of read() copies
+SHARED_MEMORY_MMAP_BYTES = int(os.getenv("SHARED_MEMORY_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+# Keep each run's memory in the store after the run finishes, e.g. to inspect it; by default it is deleted
+SHARED_MEMORY_KEEP_RUNS = os.getenv("SHARED_MEMORY_KEEP_RUNS", "0") == "1"
+
+# Namespaces whose full-text index is kept in memory; an evicted one is rebuilt on its next search
+MEMORY_INDEX_NAMESPACES = int(os.getenv("MEMORY_INDEX_NAMESPACES", "16"))
+
+# The run whose memory the tools read and write. Set by start_*_run and
+# inherited by graph nodes and tool threads, so concurrent runs never see each other's keys.
+_current_namespace: contextvars.ContextVar = contextvars.ContextVar("memory_namespace", default="default")
+
+
+def current_memory_namespace() -> str:
+    return _current_namespace.get()
+
+
+def set_memory_namespace(namespace: str):
+    """Make a namespace current for this context (and tasks/threads started from it)."""
+    _current_namespace.set(namespace)
+
+
+def start_memory_namespace(team_type: str) -> str:
+    """Create a fresh namespace for a new run, make it current and return it."""
+    namespace = f"{team_type}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    set_memory_namespace(namespace)
+    return namespace
+
+
+def _value_text(value: Any) -> str:
+    """The text of a stored value: strings as they are, anything else as JSON."""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+class MemoryBackend(ABC):
+    """Storage for shared memory: string keys to JSON-serializable values, grouped by namespace."""
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return the value of a key, or None if it is not set."""
+
+    @abstractmethod
+    def set_many(self, namespace: str, items: Dict[str, Any]):
+        """Write several keys atomically: readers see all of them or none."""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        """Remove a key; returns False if it was not present."""
+
+    @abstractmethod
+    def keys(self, namespace: str) -> List[str]:
+        """Keys in the namespace, in insertion order."""
+
+    @abstractmethod
+    def clear(self, namespace: str):
+        """Remove every key in the namespace."""
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the values of the keys that are set."""
+        values = {}
+        for key in keys:
+            value = self.get(namespace, key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def read_range(self, namespace: str, key: str, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+        """
+        Return characters [start, end) of a value, or None if the key is not set.
+
+        Non-string values are ranged over their JSON text.
+        """
+        value = self.get(namespace, key)
+        if value is None:
+            return None
+        return _value_text(value)[start:end]
+
+    def metadata(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return the length (in characters of the value's text) and type of a value, or None if it is not set."""
+        value = self.get(namespace, key)
+        if value is None:
+            return None
+        return {"length": len(_value_text(value)), "type": "text" if isinstance(value, str) else "json"}
+
+    def flush(self):
+        """Persist pending writes, for backends that buffer them."""
+
+    def close(self):
+        """Flush and release resources."""
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class SQLiteBackend(MemoryBackend):
+    """
+    Shared memory in a SQLite database in WAL mode.
+
+    WAL lets any number of readers proceed while one writer commits, across
+    threads and processes, so many runs (each in its own namespace) can share
+    one database file. Each thread gets its own connection; multi-key writes
+    are a single transaction.
+
+    Values are stored as fixed-size chunks next to a metadata row (length,
+    type, chunk size). Lengths and ranges are answered from the metadata and
+    the chunks they overlap, so previewing a long report never loads all of
+    it, and reads go through a memory map of the database file.
+    """
+
+    def __init__(self, path: str = "shared_memory.db", busy_timeout: float = 10.0,
+                 chunk_size: int = SHARED_MEMORY_CHUNK_SIZE, mmap_bytes: int = SHARED_MEMORY_MMAP_BYTES):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.chunk_size = chunk_size
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.writes = 0
+        self.range_reads = 0
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS memory_values (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                is_json INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                chunk_size INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS memory_chunks (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (namespace, key, seq)
+            ) WITHOUT ROWID""")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # Durable across crashes of this process; fsync on checkpoint
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _decode(is_json: int, text: str) -> Any:
+        return json.loads(text) if is_json else text
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        # One statement, so the value is read from a single consistent snapshot
+        rows = self._connect().execute(
+            "SELECT v.is_json, c.data FROM memory_values v JOIN memory_chunks c "
+            "ON c.namespace = v.namespace AND c.key = v.key "
+            "WHERE v.namespace = ? AND v.key = ? ORDER BY c.seq", (namespace, key)
+        ).fetchall()
+        if not rows:
+            return None
+        return self._decode(rows[0][0], ''.join(row[1] for row in rows))
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        rows = self._connect().execute(
+            "SELECT v.key, v.is_json, c.data FROM memory_values v JOIN memory_chunks c "
+            "ON c.namespace = v.namespace AND c.key = v.key "
+            f"WHERE v.namespace = ? AND v.key IN ({','.join('?' * len(keys))}) ORDER BY v.key, c.seq",
+            [namespace, *keys]
+        ).fetchall()
+        chunks: Dict[str, List[str]] = defaultdict(list)
+        types = {}
+        for key, is_json, data in rows:
+            chunks[key].append(data)
+            types[key] = is_json
+        return {key: self._decode(types[key], ''.join(chunks[key])) for key in keys if key in chunks}
+
+    def read_range(self, namespace: str, key: str, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+        conn = self._connect()
+        # A read transaction, so the metadata and the chunks come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute(
+                "SELECT length, chunk_size FROM memory_values WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            length, chunk_size = row
+            end = length if end is None else min(end, length)
+            if end <= start:
+                return ""
+            # Only the chunks overlapping [start, end) are read
+            first, last = start // chunk_size, (end - 1) // chunk_size
+            text = ''.join(data for (data,) in conn.execute(
+                "SELECT data FROM memory_chunks WHERE namespace = ? AND key = ? AND seq BETWEEN ? AND ? ORDER BY seq",
+                (namespace, key, first, last)
+            ))
+        finally:
+            conn.execute("COMMIT")
+        self.range_reads += 1
+        offset = start - first * chunk_size
+        return text[offset:offset + end - start]
+
+    def metadata(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT is_json, length, chunk_size, updated_at FROM memory_values WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        is_json, length, chunk_size, updated_at = row
+        return {"length": length, "type": "json" if is_json else "text",
+                "chunks": max(-(-length // chunk_size), 1), "updated_at": updated_at}
+
+    def set_many(self, namespace: str, items: Dict[str, Any]):
+        if not items:
+            return
+        now = time.time()
+        values, chunks = [], []
+        for key, value in items.items():
+            text = _value_text(value)
+            values.append((namespace, key, int(not isinstance(value, str)), len(text), self.chunk_size, now))
+            # An empty value still gets one (empty) chunk, so it reads back as "" rather than missing
+            for seq, offset in enumerate(range(0, max(len(text), 1), self.chunk_size)):
+                chunks.append((namespace, key, seq, text[offset:offset + self.chunk_size]))
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO memory_values (namespace, key, is_json, length, chunk_size, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE SET "
+                "is_json = excluded.is_json, length = excluded.length, "
+                "chunk_size = excluded.chunk_size, updated_at = excluded.updated_at",
+                values
+            )
+            conn.executemany("DELETE FROM memory_chunks WHERE namespace = ? AND key = ?",
+                             [(namespace, key) for key in items])
+            conn.executemany("INSERT INTO memory_chunks (namespace, key, seq, data) VALUES (?, ?, ?, ?)", chunks)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.writes += 1
+
+    def delete(self, namespace: str, key: str) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute("DELETE FROM memory_values WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.execute("DELETE FROM memory_chunks WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount > 0
+
+    def keys(self, namespace: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT key FROM memory_values WHERE namespace = ? ORDER BY rowid", (namespace,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self, namespace: str):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM memory_values WHERE namespace = ?", (namespace,))
+            conn.execute("DELETE FROM memory_chunks WHERE namespace = ?", (namespace,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path, "writes": self.writes, "range_reads": self.range_reads}
+
+
+class JsonFileBackend(MemoryBackend):
+    """
+    In-process dict with write-behind persistence to a JSON file.
+
+    Reads and writes are dict operations under a lock. Saves mark the store
+    dirty; a background thread writes a snapshot to disk at most once per flush
+    interval, so a burst of saves costs one file write. Each write goes to a
+    temporary file that is renamed over the target, so the file is always a
+    complete snapshot. Only safe for runs within one process.
+    """
+
+    def __init__(self, path: str = "shared_memory.json", flush_interval: float = SHARED_MEMORY_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._data: Dict[str, Dict[str, Any]] = {}  # namespace -> key -> value
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Serializes file writes
+        self._version = 0  # Bumped on every change
+        self._written_version = 0
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        self.writes = 0
+        try:
+            with open(self.path, 'r') as f:
+                self._data = json.load(f)
+        except (OSError, ValueError):
+            self._data = {}
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._data.get(namespace, {}).get(key)
+
+    def set_many(self, namespace: str, items: Dict[str, Any]):
+        with self._lock:
+            self._data.setdefault(namespace, {}).update(items)
+            self._changed()
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            if key not in self._data.get(namespace, {}):
+                return False
+            del self._data[namespace][key]
+            self._changed()
+            return True
+
+    def read_range(self, namespace: str, key: str, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+        with self._lock:
+            value = self._data.get(namespace, {}).get(key)
+        if value is None:
+            return None
+        return value[start:end] if isinstance(value, str) else _value_text(value)[start:end]
+
+    def keys(self, namespace: str) -> List[str]:
+        with self._lock:
+            return list(self._data.get(namespace, {}))
+
+    def clear(self, namespace: str):
+        with self._lock:
+            if self._data.pop(namespace, None) is not None:
+                self._changed()
+
+    def _changed(self):
+        """Record a change and make sure the writer will persist it. Caller must hold the lock."""
+        self._version += 1
+        if self._writer is None and not self._closed:
+            self._writer = threading.Thread(target=self._run_writer, name="shared-memory-writer", daemon=True)
+            self._writer.start()
+        self._wake.set()
+
+    def _run_writer(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                break
+            # Let further saves accumulate so they share one write
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                if self._version == self._written_version:
+                    return
+                version = self._version
+                snapshot = {namespace: dict(values) for namespace, values in self._data.items()}
+
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+
+            with self._lock:
+                self._written_version = version
+                self.writes += 1
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "json", "path": self.path, "writes": self.writes,
+                    "pending": self._version != self._written_version}
+
+
+def create_memory_backend(name: str = SHARED_MEMORY_BACKEND, path: str = SHARED_MEMORY_PATH) -> MemoryBackend:
+    """Create a memory backend by name ('sqlite' or 'json')."""
+    if name == "json":
+        return JsonFileBackend(path or "shared_memory.json")
+    if name == "sqlite":
+        return SQLiteBackend(path or "shared_memory.db")
+    raise ValueError(f"Unknown shared memory backend: {name}")
+
+
+class SharedMemory:
+    """
+    Key/value memory shared by the agents of a run, scoped to the current run's namespace.
+
+    Every operation applies to the namespace current in the calling context
+    (see start_memory_namespace), so concurrent runs sharing one backend never
+    read or overwrite each other's keys.
+
+    Writes are versioned: each key has a revision counter bumped on every
+    change, and each namespace a version bumped once per write (a set_many is
+    one write). Callers can compare revisions to skip re-reading data that has
+    not changed (see MemoryWatch). Revisions count the writes made through
+    this process, which owns the runs whose namespaces it writes to.
+    """
+
+    def __init__(self, backend: Optional[MemoryBackend] = None):
+        self.backend = backend or create_memory_backend()
+        self._revisions: Dict[str, Dict[str, int]] = defaultdict(dict)  # namespace -> key -> revision
+        self._versions: Dict[str, int] = defaultdict(int)  # namespace -> writes so far
+        self._revisions_lock = threading.Lock()
+        self._indexes: "OrderedDict[str, BM25Index]" = OrderedDict()  # namespace -> index, least recent first
+        self._index_lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.backend.get(current_memory_namespace(), key)
+        return default if value is None else value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the values of the keys that are set, in one read."""
+        return self.backend.get_many(current_memory_namespace(), keys)
+
+    def set(self, key: str, value: Any):
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]):
+        """Write several keys in one transaction."""
+        namespace = current_memory_namespace()
+        self.backend.set_many(namespace, items)
+        self._update_index(namespace, items)
+        self._record_write(namespace, list(items))
+
+    def delete(self, key: str) -> bool:
+        namespace = current_memory_namespace()
+        deleted = self.backend.delete(namespace, key)
+        if deleted:
+            self._update_index(namespace, {key: None})
+            self._record_write(namespace, [key])
+        return deleted
+
+    def read_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+        """
+        Return characters [start, end) of a value without loading the rest of it.
+
+        Args:
+            key: Memory key
+            start: First character, counted from 0
+            end: Character after the last one; None reads to the end
+
+        Returns:
+            The range (shorter if the value is), or None if the key is not set
+        """
+        return self.backend.read_range(current_memory_namespace(), key, start, end)
+
+    def preview(self, key: str, length: int = 200) -> Optional[str]:
+        """Return the first characters of a value, with "..." appended if it is longer."""
+        namespace = current_memory_namespace()
+        text = self.backend.read_range(namespace, key, 0, length + 1)
+        if text is None or len(text) <= length:
+            return text
+        return text[:length] + "..."
+
+    def length(self, key: str) -> Optional[int]:
+        """Length of a value's text in characters, or None if the key is not set."""
+        metadata = self.backend.metadata(current_memory_namespace(), key)
+        return metadata["length"] if metadata else None
+
+    def metadata(self, key: str) -> Optional[Dict[str, Any]]:
+        """Length, type, revision and backend details of a value, or None if the key is not set."""
+        metadata = self.backend.metadata(current_memory_namespace(), key)
+        if metadata is None:
+            return None
+        return dict(metadata, revision=self.revision(key))
+
+    def keys(self) -> List[str]:
+        return self.backend.keys(current_memory_namespace())
+
+    def __contains__(self, key: str) -> bool:
+        return self.backend.metadata(current_memory_namespace(), key) is not None
+
+    def clear(self):
+        """Remove every key in the current namespace."""
+        namespace = current_memory_namespace()
+        keys = self.backend.keys(namespace)
+        self.backend.clear(namespace)
+        with self._index_lock:
+            self._indexes.pop(namespace, None)
+        if keys:
+            self._record_write(namespace, keys)
+
+    def release(self):
+        """Delete the current namespace and forget its revisions and index, once its run is over."""
+        namespace = current_memory_namespace()
+        self.backend.clear(namespace)
+        with self._index_lock:
+            self._indexes.pop(namespace, None)
+        with self._revisions_lock:
+            self._revisions.pop(namespace, None)
+            self._versions.pop(namespace, None)
+
+    def search(self, query: str, k: int = 5, keys: Optional[Iterable[str]] = None) -> List[Tuple[str, str, float]]:
+        """
+        Find the passages of the current namespace's values most relevant to a query.
+
+        Args:
+            query: Free-text query
+            k: Number of passages to return
+            keys: Only search the values of these keys
+
+        Returns:
+            Up to k (key, passage, score) tuples, best first
+        """
+        return self._index(current_memory_namespace()).search(query, k, keys)
+
+    def _index(self, namespace: str) -> BM25Index:
+        """Return a namespace's index, building it from the backend if it is not in memory."""
+        with self._index_lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = BM25Index()
+                keys = self.backend.keys(namespace)
+                for key, value in self.backend.get_many(namespace, keys).items():
+                    index.add(key, _value_text(value))
+                self._indexes[namespace] = index
+                while len(self._indexes) > MEMORY_INDEX_NAMESPACES:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(namespace)
+            return index
+
+    def _update_index(self, namespace: str, items: Dict[str, Any]):
+        """Apply written values (None for deleted keys) to a namespace's index, if it is in memory."""
+        with self._index_lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                return  # Built from the backend, including this write, on the next search
+            for key, value in items.items():
+                if value is None:
+                    index.remove(key)
+                else:
+                    index.add(key, _value_text(value))
+
+    def revision(self, key: str) -> int:
+        """How many times a key has changed in the current namespace (0 if never written)."""
+        with self._revisions_lock:
+            return self._revisions[current_memory_namespace()].get(key, 0)
+
+    def revisions(self, keys: Iterable[str]) -> Tuple[int, ...]:
+        """Revisions of several keys, in order."""
+        with self._revisions_lock:
+            revisions = self._revisions[current_memory_namespace()]
+            return tuple(revisions.get(key, 0) for key in keys)
+
+    def version(self) -> int:
+        """Number of writes made to the current namespace."""
+        with self._revisions_lock:
+            return self._versions[current_memory_namespace()]
+
+    def _record_write(self, namespace: str, keys: List[str]):
+        with self._revisions_lock:
+            revisions = self._revisions[namespace]
+            for key in keys:
+                revisions[key] = revisions.get(key, 0) + 1
+            self._versions[namespace] += 1
+
+    def flush(self):
+        self.backend.flush()
+
+    def close(self):
+        self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.backend.stats(), namespace=current_memory_namespace(), keys=len(self.keys()),
+                    version=self.version())
+
+
+class MemoryWatch:
+    """
+    Recompute a value derived from shared memory only when its inputs change.
+
+    Agents derive status summaries from a handful of memory keys on every
+    iteration. A watch remembers the watched keys' revisions alongside the
+    value it last computed, per namespace, and returns that value without
+    touching memory until one of the keys is written again.
+    """
+
+    def __init__(self, keys: Optional[Iterable[str]] = None, max_namespaces: int = 64):
+        """
+        Args:
+            keys: Keys the value depends on; any write invalidates it if None
+            max_namespaces: Runs to remember values for, least recent dropped first
+        """
+        self.keys = list(keys) if keys is not None else None
+        self.max_namespaces = max_namespaces
+        self._values: "OrderedDict[str, Tuple[Tuple[int, ...], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.computed = 0
+        self.skipped = 0
+
+    def cached(self, compute: Callable[[], Any]) -> Any:
+        """Return compute()'s last result if none of the watched keys changed since, else call it."""
+        memory = get_shared_memory()
+        namespace = current_memory_namespace()
+        # Taken before computing, so a write that races with compute() triggers a recompute next time
+        token = memory.revisions(self.keys) if self.keys is not None else (memory.version(),)
+
+        with self._lock:
+            entry = self._values.get(namespace)
+            if entry is not None and entry[0] == token:
+                self._values.move_to_end(namespace)
+                self.skipped += 1
+                return entry[1]
+
+        value = compute()
+        with self._lock:
+            self.computed += 1
+            self._values[namespace] = (token, value)
+            self._values.move_to_end(namespace)
+            while len(self._values) > self.max_namespaces:
+                self._values.popitem(last=False)
+        return value
+
+
+_shared_memory: Optional[SharedMemory] = None
+_shared_memory_lock = threading.Lock()
+
+
+def get_shared_memory() -> SharedMemory:
+    """Return the process-wide shared memory, creating it on first use."""
+    global _shared_memory
+    with _shared_memory_lock:
+        if _shared_memory is None:
+            _shared_memory = SharedMemory()
+            atexit.register(_shared_memory.close)
+        return _shared_memory
+
+
+def finish_memory_namespace():
+    """
+    End the current run's use of shared memory.
+
+    The run's namespace is deleted so the store does not grow with every run,
+    unless SHARED_MEMORY_KEEP_RUNS=1, in which case it is only flushed.
+    """
+    memory = get_shared_memory()
+    if SHARED_MEMORY_KEEP_RUNS:
+        memory.flush()
+    else:
+        memory.release()
\ No newline at end of file
@@ -0,0 +1,211 @@
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Ask for schema-checked JSON from planning and classification calls instead of free text
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") != "0"
+
+# Passed to the model as generation_config; Gemini then only emits valid JSON
+JSON_GENERATION_PARAMS: Dict[str, Any] = {"response_mime_type": "application/json"}
+
+# Start of the instruction appended to classification prompts (see answer_instructions)
+JSON_ANSWER_MARKER = "Format your answer as ONLY a JSON object matching this JSON schema"
+
+# Input formats of tools that expect more than free text, keyed by tool name.
+# Plans naming these tools are rejected (and repaired) if the input does not match.
+TOOL_INPUT_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "respond": {"type": "string", "minLength": 1},
+    "web_search": {"type": "string", "minLength": 1},
+    "web_search_many": {"type": "string", "minLength": 1},
+    "calculator": {"type": "string", "pattern": r"^[0-9+\-*/()., ]+$"},
+    "save_to_memory": {"type": "string", "pattern": r"^[^:]+::[\s\S]+$"},
+    "read_from_memory": {"type": "string", "minLength": 1},
+    "read_many": {"type": "string", "minLength": 1},
+    "search_memory": {"type": "string", "minLength": 1},
+    "save_many": {"type": "string", "pattern": r"^\s*\{[\s\S]*\}\s*$"},
+    "extract_facts": {"type": "string", "minLength": 1},
+    "word_count": {"type": "string", "minLength": 1},
+    "check_factual_consistency": {"type": "string", "pattern": r"^[\s\S]+::[\s\S]+$"},
+    "create_outline": {"type": "string", "minLength": 1},
+}
+
+
+def answer_schema(value_schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Schema for a classification answer: an object with a single "answer" field."""
+    return {"type": "object", "required": ["answer"], "properties": {"answer": value_schema}}
+
+
+DECISION_SCHEMA = answer_schema({"type": "string", "enum": ["COMPLETE", "CONTINUE"]})
+SCORE_SCHEMA = answer_schema({"type": "integer", "minimum": 1, "maximum": 10})
+
+
+def choice_schema(options: Iterable[str]) -> Dict[str, Any]:
+    """Schema for an answer picked from a fixed list of options."""
+    return answer_schema({"type": "string", "enum": list(options)})
+
+
+def plan_schema(tool_names: Iterable[str], max_steps: int = 1) -> Dict[str, Any]:
+    """Schema for a planning response: ordered actions plus the reasoning behind them."""
+    return {
+        "type": "object",
+        "required": ["actions", "reasoning"],
+        "properties": {
+            "actions": {
+                "type": "array",
+                "minItems": 1,
+                "maxItems": max_steps,
+                "items": {
+                    "type": "object",
+                    "required": ["action", "input"],
+                    "properties": {
+                        "action": {"type": "string", "enum": list(tool_names) + ["respond"]},
+                        "input": {"type": "string"}
+                    }
+                }
+            },
+            "reasoning": {"type": "string"}
+        }
+    }
+
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+
+def json_generation_params(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generation params asking for JSON constrained to a schema.
+
+    Backends that support it (Gemini's response_schema) decode against the
+    schema; the rest only see the JSON mime type and rely on the prompt.
+    """
+    return dict(JSON_GENERATION_PARAMS, response_schema=schema)
+
+
+def validate(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Check a value against a JSON schema.
+
+    Supports the subset the agents use: type, enum, required, properties,
+    items, minItems/maxItems, minLength, pattern and minimum/maximum.
+
+    Returns:
+        One message per violation; empty if the value is valid
+    """
+    expected = schema.get("type")
+    if expected:
+        python_type = _TYPES[expected]
+        if not isinstance(value, python_type) or (isinstance(value, bool) and expected != "boolean"):
+            return [f"{path}: expected {expected}, got {type(value).__name__}"]
+
+    errors = []
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: {value!r} is not one of {schema['enum']}")
+    if isinstance(value, str):
+        if len(value.strip()) < schema.get("minLength", 0):
+            errors.append(f"{path}: must not be empty")
+        if "pattern" in schema and not re.search(schema["pattern"], value):
+            errors.append(f"{path}: does not match the expected format {schema['pattern']}")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append(f"{path}: must be at least {schema['minimum']}")
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append(f"{path}: must be at most {schema['maximum']}")
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing required field '{key}'")
+        for key, field_schema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], field_schema, f"{path}.{key}"))
+    if isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            errors.append(f"{path}: needs at least {schema['minItems']} items")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            errors.append(f"{path}: allows at most {schema['maxItems']} items")
+        if "items" in schema:
+            for i, item in enumerate(value):
+                errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def validate_plan(plan: Any, tool_names: Iterable[str], max_steps: int = 1) -> List[str]:
+    """Validate a plan against plan_schema, then each step's input against its tool's schema."""
+    errors = validate(plan, plan_schema(tool_names, max_steps))
+    if errors:
+        return errors
+    for i, step in enumerate(plan["actions"]):
+        input_schema = TOOL_INPUT_SCHEMAS.get(step["action"])
+        if input_schema:
+            errors.extend(validate(step["input"], input_schema, f"$.actions[{i}].input"))
+    return errors
+
+
+def extract_json(text: str) -> Any:
+    """
+    Parse the JSON object in a model response, tolerating code fences and surrounding prose.
+
+    Raises:
+        ValueError: If the response contains no parseable JSON object
+    """
+    text = text.strip()
+    fenced = re.search(r"```(?:json)?\s*([\s\S]*?)```", text)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    start = text.find('{')
+    if start == -1:
+        raise ValueError("No JSON object found in response")
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text[start:])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    return value
+
+
+def parse_structured(text: str, schema: Dict[str, Any]) -> Tuple[Optional[Any], List[str]]:
+    """
+    Parse and validate a structured response.
+
+    Returns:
+        (value, []) if the response is valid, otherwise (None, errors)
+    """
+    try:
+        value = extract_json(text)
+    except ValueError as e:
+        return None, [str(e)]
+    errors = validate(value, schema)
+    return (None, errors) if errors else (value, [])
+
+
+def answer_instructions(schema: Dict[str, Any]) -> str:
+    """Instruction appended to a classification prompt asking for a JSON answer."""
+    return f"""
+
+        {JSON_ANSWER_MARKER} (no other text):
+        {json.dumps(schema)}"""
+
+
+def build_repair_prompt(text: str, schema: Dict[str, Any], errors: List[str]) -> str:
+    """Prompt asking a model to fix a response that failed validation."""
+    return f"""The response below was supposed to be a JSON object matching this JSON schema:
+{json.dumps(schema)}
+
+It failed validation:
+{chr(10).join('- ' + error for error in errors[:10])}
+
+Response:
+{text}
+
+Return ONLY the corrected JSON object. Keep the original content wherever it is valid."""
\ No newline at end of file
@@ -5,6 +5,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.base_agent import BaseAgent
+from src.shared_memory import MemoryWatch, get_shared_memory
 from src.tools import ANALYSIS_TOOLS
 
 class SwarmAnalysisAgent(BaseAgent):
@@ -15,6 +16,8 @@ class SwarmAnalysisAgent(BaseAgent):
         self.analysis_depth = "standard"
         self.analysis_iterations = 0
         self.max_iterations = 4
+        self.max_actions_per_plan = 3  # Actions run per planning call before re-planning
+        self.data_watch = MemoryWatch(['research_synthesis'])
     
     def get_system_prompt(self) -> str:
         return """You are an Analysis Agent in a decentralized swarm team.
@@ -57,24 +60,25 @@ class SwarmAnalysisAgent(BaseAgent):
             # Plan next analytical action
             action_plan = self.plan_next_action(messages, context)
             
-            # Execute planned action
-            if action_plan['action'] == 'respond':
-                # Direct response
-                analysis_results.append({
-                    'type': 'insight',
-                    'content': action_plan['input']
-                })
-            else:
-                # Execute analytical tool
-                result = self.execute_tool(action_plan['action'], action_plan['input'])
-                analysis_results.append({
-                    'tool': action_plan['action'],
-                    'result': result,
-                    'reasoning': action_plan['reasoning']
-                })
-                
-                # Update messages with result
-                messages.append(AIMessage(content=f"Analysis using {action_plan['action']}: {result[:200]}..."))
+            # Execute the planned actions in order
+            for step in action_plan['actions']:
+                if step['action'] == 'respond':
+                    # Direct response
+                    analysis_results.append({
+                        'type': 'insight',
+                        'content': step['input']
+                    })
+                else:
+                    # Execute analytical tool
+                    result = self.execute_action(step)
+                    analysis_results.append({
+                        'tool': step['action'],
+                        'result': result,
+                        'reasoning': step['reasoning']
+                    })
+                    
+                    # Update messages with result
+                    messages.append(AIMessage(content=f"Analysis using {step['action']}: {result[:200]}..."))
             
             self.analysis_iterations += 1
             
@@ -111,19 +115,14 @@ class SwarmAnalysisAgent(BaseAgent):
         return " | ".join(context_parts)
     
     def check_data_availability(self) -> str:
-        """Check what data is available in memory."""
-        available_data = []
-        
-        # Try to check memory for common keys
-        for tool in self.tools:
-            if 'memory' in tool.name.lower() and 'read' in tool.name.lower():
-                # Check for research data
-                research_check = self.execute_tool(tool.name, 'research_synthesis')
-                if "No data found" not in research_check:
-                    available_data.append("research findings")
-                break
-        
-        return ", ".join(available_data) if available_data else "No data in memory"
+        """Check what data is available in memory, re-reading it only after the research data changed."""
+        return self.data_watch.cached(self.read_data_availability)
+    
+    def read_data_availability(self) -> str:
+        # Only the key's metadata is read, not the research itself
+        if 'research_synthesis' in get_shared_memory():
+            return "research findings"
+        return "No data in memory"
     
     def is_analysis_complete(self, results: List, depth: str) -> bool:
         """Determine if analysis is complete."""
@@ -5,7 +5,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.base_agent import BaseAgent
-from src.tools import RESEARCH_TOOLS
+from src.structured_output import DECISION_SCHEMA
+from src.tools import RESEARCH_TOOLS, split_search_results
 
 class SwarmResearchAgent(BaseAgent):
     """Research agent for the swarm team that can communicate directly with other agents."""
@@ -15,6 +16,7 @@ class SwarmResearchAgent(BaseAgent):
         self.research_phase = "initial"
         self.research_iterations = 0
         self.max_iterations = 10  # Increased from 5 to allow more thorough research
+        self.max_actions_per_plan = 4  # Actions run per planning call before re-planning
     
     def get_system_prompt(self) -> str:
         return """You are a Research Agent in a decentralized swarm team.
@@ -31,6 +33,7 @@ class SwarmResearchAgent(BaseAgent):
         You work autonomously and collaboratively. Use your tools strategically:
         - First create an outline with create_outline tool (request 3+ body sections)
         - Use search tools extensively to find detailed information
+        - Use web_search_many to research several sections in one step (one query per section)
         - Use extraction tools to process findings
         - Use memory tools to save data organized by section
         - Use validation tools to check facts
@@ -72,27 +75,38 @@ class SwarmResearchAgent(BaseAgent):
             
             action_plan = self.plan_next_action(messages, context)
             
-            # Execute the planned action
-            if action_plan['action'] == 'respond':
-                # Agent decided to respond directly
-                response_content = action_plan['input']
-                all_findings.append(response_content)
-            else:
-                # Execute tool
-                result = self.execute_tool(action_plan['action'], action_plan['input'])
-                all_findings.append({
-                    'tool': action_plan['action'],
-                    'result': result,
-                    'reasoning': action_plan['reasoning']
-                })
-                
-                # Track which section this research covers
-                if 'section' in action_plan['reasoning'].lower():
-                    # Extract section number/name
-                    sections_researched.add(len(all_findings))
-                
-                # Add result to messages for context
-                messages.append(AIMessage(content=f"Tool {action_plan['action']} result: {result[:200]}..."))
+            # Execute the planned actions in order
+            for step in action_plan['actions']:
+                if step['action'] == 'respond':
+                    # Agent decided to respond directly
+                    response_content = step['input']
+                    all_findings.append(response_content)
+                else:
+                    # Execute tool
+                    result = self.execute_action(step)
+                    if step['action'] == 'web_search_many':
+                        # One finding per query, as if each had been a separate web_search
+                        for query, query_result in split_search_results(result):
+                            all_findings.append({
+                                'tool': 'web_search',
+                                'query': query,
+                                'result': query_result,
+                                'reasoning': step['reasoning']
+                            })
+                    else:
+                        all_findings.append({
+                            'tool': step['action'],
+                            'result': result,
+                            'reasoning': step['reasoning']
+                        })
+                    
+                    # Track which section this research covers
+                    if 'section' in step['reasoning'].lower():
+                        # Extract section number/name
+                        sections_researched.add(len(all_findings))
+                    
+                    # Add result to messages for context
+                    messages.append(AIMessage(content=f"Tool {step['action']} result: {result[:200]}..."))
             
             self.research_iterations += 1
             
@@ -187,7 +201,11 @@ class SwarmResearchAgent(BaseAgent):
         
         Answer with: COMPLETE or CONTINUE"""
         
-        response = self.generate_response(messages, assessment_prompt)
+        response = self.generate_routed(
+            'assess_research_completeness', messages, assessment_prompt,
+            lambda answer: 'COMPLETE' in answer.upper() or 'CONTINUE' in answer.upper(),
+            schema=DECISION_SCHEMA
+        )
         return "COMPLETE" in response.upper()
     
     def prepare_final_response(self, findings: List, from_agent: Optional[str]) -> Dict[str, Any]:
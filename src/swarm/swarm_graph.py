@@ -1,15 +1,15 @@
 from typing import TypedDict, List, Annotated, Optional
-from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
 from langchain_core.messages import AnyMessage, HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from src.swarm.research_agent import SwarmResearchAgent
-from src.swarm.analysis_agent import SwarmAnalysisAgent
-from src.swarm.writer_agent import SwarmWriterAgent
 from src.logging_utils import AgentLogger, save_report, log_agent_communication
+from src.resilience import ModelCallError
+from src.usage_ledger import UsageLedger, track_node
+from src.lazy import LazyAgent, add_messages, start_agent_scope
+from src.shared_memory import finish_memory_namespace, get_shared_memory, start_memory_namespace
 
 # Define state structure
 class SwarmState(TypedDict):
@@ -21,31 +21,29 @@ class SwarmState(TypedDict):
     report: Optional[str]
     iteration_count: int
     logger: AgentLogger  # Add logger to state</    
+    ledger: UsageLedger
+    error: Optional[str]
 
-# Initialize agents
-research_agent = SwarmResearchAgent()
-analysis_agent = SwarmAnalysisAgent()
-writer_agent = SwarmWriterAgent()
+# Agents are created on first use, so importing this module stays cheap; each run gets its own
+research_agent = LazyAgent("src.swarm.research_agent:SwarmResearchAgent")
+analysis_agent = LazyAgent("src.swarm.analysis_agent:SwarmAnalysisAgent")
+writer_agent = LazyAgent("src.swarm.writer_agent:SwarmWriterAgent")
 
-def research_node(state: SwarmState) -> SwarmState:
-    """Research agent node."""
-    research_agent.set_logger(state["logger"])
+def apply_model_error(state: SwarmState, agent, error: ModelCallError) -> SwarmState:
+    """Record a failed model call so the graph ends the run instead of spending more round trips."""
+    agent.log(f"Model call failed, stopping run: {str(error)}", {"error_type": type(error).__name__})
     
-    from_agent = state.get("from_agent")
-    if from_agent:
-        research_agent.log(f"Received request from {from_agent}")
-    else:
-        research_agent.log("Starting initial research")
-    
-    result = research_agent.process(
-        state["messages"],
-        from_agent=from_agent,
-        instruction=state.get("instruction_for_next")
-    )
+    new_state = state.copy()
+    new_state["error"] = f"{type(error).__name__}: {str(error)}"
     
+    return new_state
+
+def apply_research_result(state: SwarmState, result: dict) -> SwarmState:
+    """Fold the research agent's output and handoff into the graph state."""
     new_state = state.copy()
     new_state["messages"].extend(result["messages"])
     new_state["from_agent"] = "research"
+    new_state["iteration_count"] += 1
     
     if result.get("next_agent"):
         new_state["current_agent"] = result["next_agent"]
@@ -62,22 +60,56 @@ def research_node(state: SwarmState) -> SwarmState:
     
     return new_state
 
-def analysis_node(state: SwarmState) -> SwarmState:
-    """Analysis agent node."""
-    analysis_agent.set_logger(state["logger"])
+@track_node("research")
+def research_node(state: SwarmState) -> SwarmState:
+    """Research agent node."""
+    research_agent.set_logger(state["logger"])
     
     from_agent = state.get("from_agent")
-    analysis_agent.log(f"Received request from {from_agent}")
+    if from_agent:
+        research_agent.log(f"Received request from {from_agent}")
+    else:
+        research_agent.log("Starting initial research")
+    
+    try:
+        result = research_agent.process(
+            state["messages"],
+            from_agent=from_agent,
+            instruction=state.get("instruction_for_next")
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, research_agent, e)
+    
+    return apply_research_result(state, result)
+
+@track_node("research")
+async def aresearch_node(state: SwarmState) -> SwarmState:
+    """Research agent node (async)."""
+    research_agent.set_logger(state["logger"])
+    
+    from_agent = state.get("from_agent")
+    if from_agent:
+        research_agent.log(f"Received request from {from_agent}")
+    else:
+        research_agent.log("Starting initial research")
     
-    result = analysis_agent.process(
-        state["messages"],
-        from_agent=from_agent,
-        instruction=state.get("instruction_for_next")
-    )
+    try:
+        result = await research_agent.aprocess(
+            state["messages"],
+            from_agent=from_agent,
+            instruction=state.get("instruction_for_next")
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, research_agent, e)
     
+    return apply_research_result(state, result)
+
+def apply_analysis_result(state: SwarmState, result: dict) -> SwarmState:
+    """Fold the analysis agent's output and handoff into the graph state."""
     new_state = state.copy()
     new_state["messages"].extend(result["messages"])
     new_state["from_agent"] = "analysis"
+    new_state["iteration_count"] += 1
     
     if result.get("next_agent"):
         new_state["current_agent"] = result["next_agent"]
@@ -94,22 +126,50 @@ def analysis_node(state: SwarmState) -> SwarmState:
     
     return new_state
 
-def writer_node(state: SwarmState) -> SwarmState:
-    """Writer agent node - can declare task complete."""
-    writer_agent.set_logger(state["logger"])
+@track_node("analysis")
+def analysis_node(state: SwarmState) -> SwarmState:
+    """Analysis agent node."""
+    analysis_agent.set_logger(state["logger"])
     
     from_agent = state.get("from_agent")
-    writer_agent.log(f"Received request from {from_agent}")
+    analysis_agent.log(f"Received request from {from_agent}")
     
-    result = writer_agent.process(
-        state["messages"],
-        from_agent=from_agent,
-        instruction=state.get("instruction_for_next")
-    )
+    try:
+        result = analysis_agent.process(
+            state["messages"],
+            from_agent=from_agent,
+            instruction=state.get("instruction_for_next")
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, analysis_agent, e)
+    
+    return apply_analysis_result(state, result)
+
+@track_node("analysis")
+async def aanalysis_node(state: SwarmState) -> SwarmState:
+    """Analysis agent node (async)."""
+    analysis_agent.set_logger(state["logger"])
     
+    from_agent = state.get("from_agent")
+    analysis_agent.log(f"Received request from {from_agent}")
+    
+    try:
+        result = await analysis_agent.aprocess(
+            state["messages"],
+            from_agent=from_agent,
+            instruction=state.get("instruction_for_next")
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, analysis_agent, e)
+    
+    return apply_analysis_result(state, result)
+
+def apply_writer_result(state: SwarmState, result: dict) -> SwarmState:
+    """Fold the writer agent's output, completion or handoff into the graph state."""
     new_state = state.copy()
     new_state["messages"].extend(result["messages"])
     new_state["from_agent"] = "writer"
+    new_state["iteration_count"] += 1
     
     if result.get("complete") and result.get("next_agent") is None:
         # Task is complete
@@ -131,62 +191,98 @@ def writer_node(state: SwarmState) -> SwarmState:
     
     return new_state
 
+@track_node("writer")
+def writer_node(state: SwarmState) -> SwarmState:
+    """Writer agent node - can declare task complete."""
+    writer_agent.set_logger(state["logger"])
+    
+    from_agent = state.get("from_agent")
+    writer_agent.log(f"Received request from {from_agent}")
+    
+    try:
+        result = writer_agent.process(
+            state["messages"],
+            from_agent=from_agent,
+            instruction=state.get("instruction_for_next")
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, writer_agent, e)
+    
+    return apply_writer_result(state, result)
+
+@track_node("writer")
+async def awriter_node(state: SwarmState) -> SwarmState:
+    """Writer agent node - can declare task complete (async)."""
+    writer_agent.set_logger(state["logger"])
+    
+    from_agent = state.get("from_agent")
+    writer_agent.log(f"Received request from {from_agent}")
+    
+    try:
+        result = await writer_agent.aprocess(
+            state["messages"],
+            from_agent=from_agent,
+            instruction=state.get("instruction_for_next")
+        )
+    except ModelCallError as e:
+        return apply_model_error(state, writer_agent, e)
+    
+    return apply_writer_result(state, result)
+
+def route_next_agent(state: SwarmState) -> str:
+    """Route to the agent chosen by the last handoff, or end the run."""
+    from langgraph.graph import END
+    
+    if state.get("error"):
+        state["logger"].log("System", f"Stopping after model failure: {state['error']}")
+        return END
+    
+    if state.get("task_complete"):
+        return END
+    
+    return state.get("current_agent", "analysis")
+
 def build_swarm_graph():
     """Build the swarm team graph with peer-to-peer communication."""
+    from langgraph.graph import StateGraph, START, END
+    
     workflow = StateGraph(SwarmState)
     
-    # Add nodes
-    workflow.add_node("research", research_node)
-    workflow.add_node("analysis", analysis_node) 
-    workflow.add_node("writer", writer_node)
+    # Add nodes - each has a sync and an async implementation so the same
+    # graph can be driven by invoke() or by ainvoke() on a shared event loop
+    workflow.add_node("research", RunnableLambda(research_node, afunc=aresearch_node))
+    workflow.add_node("analysis", RunnableLambda(analysis_node, afunc=aanalysis_node))
+    workflow.add_node("writer", RunnableLambda(writer_node, afunc=awriter_node))
     
     # Entry point - always start with research
     workflow.add_edge(START, "research")
     
     # Dynamic routing based on agent decisions
-    workflow.add_conditional_edges(
-        "research",
-        lambda state: state.get("current_agent", "analysis"),
-        {
-            "research": "research",
-            "analysis": "analysis", 
-            "writer": "writer"
-        }
-    )
-    
-    workflow.add_conditional_edges(
-        "analysis",
-        lambda state: state.get("current_agent", "writer"),
-        {
-            "research": "research",
-            "analysis": "analysis",
-            "writer": "writer"
-        }
-    )
-    
-    workflow.add_conditional_edges(
-        "writer",
-        lambda state: END if state.get("task_complete") else state.get("current_agent", "analysis"),
-        {
-            "research": "research",
-            "analysis": "analysis",
-            "writer": "writer",
-            END: END
-        }
-    )
+    for agent in ["research", "analysis", "writer"]:
+        workflow.add_conditional_edges(
+            agent,
+            route_next_agent,
+            {
+                "research": "research",
+                "analysis": "analysis",
+                "writer": "writer",
+                END: END
+            }
+        )
     
     return workflow.compile()
 
-def run_swarm_team(task: str, word_count: int = 500) -> str:
-    """Run the swarm team on a given task."""
-    # Clear shared memory at start
-    import os
-    if os.path.exists('shared_memory.json'):
-        os.remove('shared_memory.json')
+def start_swarm_run(task: str, word_count: int = 500) -> tuple:
+    """Give the run its own memory namespace and agents, and build the logger, graph and initial state."""
+    # Keys saved during this run live in a fresh namespace, so concurrent runs don't collide
+    namespace = start_memory_namespace("swarm")
+    start_agent_scope()
     
     # Initialize logger
     logger = AgentLogger("swarm")
+    ledger = UsageLedger("swarm", task)
     logger.log("System", f"Starting swarm team for task: {task}")
+    logger.log("System", f"Shared memory namespace: {namespace}")
     logger.log("System", f"Target word count: {word_count}")
     logger.log_separator("Task Execution - Peer-to-Peer Communication")
     
@@ -200,27 +296,28 @@ def run_swarm_team(task: str, word_count: int = 500) -> str:
         "instruction_for_next": None,
         "report": None,
         "iteration_count": 0,
-        "logger": logger
+        "logger": logger,
+        "ledger": ledger,
+        "error": None
     }
     
-    # Run the graph
-    result = graph.invoke(initial_state)
+    return logger, graph, initial_state
+
+def finish_swarm_run(task: str, logger: AgentLogger, result: dict) -> str:
+    """Extract, log and save the report produced by a finished run; call before finish_memory_namespace."""
+    if result.get("error"):
+        logger.log("System", f"Run stopped early by model failure: {result['error']}")
     
     # Get report from state or memory
     report = result.get("report")
     if not report:
         # Try to get from memory as fallback
-        try:
-            from tools import read_from_memory
-            report = read_from_memory.invoke("final_report")
-            if "No data found" not in report:
-                logger.log("System", "Retrieved report from shared memory")
-            else:
-                report = "Report generation did not complete successfully."
-                logger.log("System", "Report generation failed - no report found")
-        except Exception as e:
-            logger.log("System", f"Error retrieving report: {str(e)}")
+        report = get_shared_memory().get("final_report")
+        if report:
+            logger.log("System", "Retrieved report from shared memory")
+        else:
             report = "Report generation did not complete successfully."
+            logger.log("System", "Report generation failed - no report found")
     
     # Save the report if successful
     if report and "Report generation did not complete" not in report:
@@ -231,10 +328,39 @@ def run_swarm_team(task: str, word_count: int = 500) -> str:
             report,
             "swarm",
             task,
-            logger.get_log_number()
+            logger.get_log_number(),
+            ledger=result.get("ledger")
         )
         logger.log("System", f"Report saved to: {report_file}")
     
+    if result.get("ledger"):
+        totals = result["ledger"].summary()["totals"]
+        logger.log("System", "Model usage", totals)
+    
     logger.log_separator("End of Execution")
     
-    return report
\ No newline at end of file
+    return report
+
+def run_swarm_team(task: str, word_count: int = 500) -> str:
+    """Run the swarm team on a given task."""
+    logger, graph, initial_state = start_swarm_run(task, word_count)
+    
+    try:
+        # Run the graph
+        result = graph.invoke(initial_state)
+        return finish_swarm_run(task, logger, result)
+    finally:
+        # Delete the run's memory once the report has been read, or when the graph raised
+        finish_memory_namespace()
+
+async def arun_swarm_team(task: str, word_count: int = 500) -> str:
+    """Run the swarm team on a given task inside the current event loop."""
+    logger, graph, initial_state = start_swarm_run(task, word_count)
+    
+    try:
+        # Run the graph
+        result = await graph.ainvoke(initial_state)
+        return finish_swarm_run(task, logger, result)
+    finally:
+        # Delete the run's memory once the report has been read, or when the graph raised
+        finish_memory_namespace()
\ No newline at end of file
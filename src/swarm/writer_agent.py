@@ -6,7 +6,9 @@ import re
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from src.base_agent import BaseAgent
-from src.tools import WRITER_TOOLS
+from src.shared_memory import MemoryWatch, get_shared_memory
+from src.structured_output import SCORE_SCHEMA
+from src.tools import MEMORY_READ_TOOLS, WRITER_TOOLS
 
 class SwarmWriterAgent(BaseAgent):
     """Writer agent for the swarm team that determines when the task is complete."""
@@ -17,8 +19,10 @@ class SwarmWriterAgent(BaseAgent):
         self.minimum_word_count = 500  # Will be updated to match target
         self.revision_count = 0
         self.max_revisions = 3
+        self.max_actions_per_plan = 3  # Actions run per planning call before re-planning
         self.writing_phase = "drafting"
         self.min_body_sections = 3  # Minimum number of body sections
+        self.data_watch = MemoryWatch(['analysis_insights', 'research_synthesis', 'key_insights'])
     
     def get_system_prompt(self) -> str:
         return """You are a Writer Agent in a decentralized swarm team.
@@ -40,6 +44,7 @@ class SwarmWriterAgent(BaseAgent):
         
         You work autonomously and can:
         - Use memory tools to access ALL research and analysis
+        - Use search_memory to find the passages relevant to the section you are writing
         - Use writing/formatting tools to structure content
         - Use quality assessment tools to evaluate your work
         - Use word count tools to track length
@@ -74,27 +79,28 @@ class SwarmWriterAgent(BaseAgent):
             # Plan next writing action
             action_plan = self.plan_next_action(messages, context)
             
-            # Execute planned action
-            if action_plan['action'] == 'respond':
-                # Direct writing
-                report_sections.append(action_plan['input'])
-            else:
-                # Use a tool
-                result = self.execute_tool(action_plan['action'], action_plan['input'])
-                
-                # Handle tool results
-                if 'word_count' in action_plan['action'].lower():
-                    # Track word count
-                    self.update_memory('last_word_count', result)
-                elif 'memory' in action_plan['action'].lower() and 'read' in action_plan['action'].lower():
-                    # Retrieved data, use it for writing
-                    messages.append(AIMessage(content=f"Retrieved: {result[:200]}..."))
-                elif 'quality' in action_plan['action'].lower() or 'assess' in action_plan['action'].lower():
-                    # Quality assessment
-                    self.update_memory('quality_assessment', result)
+            # Execute the planned actions in order
+            for step in action_plan['actions']:
+                if step['action'] == 'respond':
+                    # Direct writing
+                    report_sections.append(step['input'])
                 else:
-                    # Other tool results
-                    report_sections.append(f"[Tool result: {result[:100]}...]")
+                    # Use a tool
+                    result = self.execute_action(step)
+                    
+                    # Handle tool results
+                    if 'word_count' in step['action'].lower():
+                        # Track word count
+                        self.update_memory('last_word_count', result)
+                    elif step['action'] in MEMORY_READ_TOOLS:
+                        # Retrieved data, use it for writing
+                        messages.append(AIMessage(content=f"Retrieved: {result[:200]}..."))
+                    elif 'quality' in step['action'].lower() or 'assess' in step['action'].lower():
+                        # Quality assessment
+                        self.update_memory('quality_assessment', result)
+                    else:
+                        # Other tool results
+                        report_sections.append(f"[Tool result: {result[:100]}...]")
             
             iterations += 1
             
@@ -164,20 +170,12 @@ class SwarmWriterAgent(BaseAgent):
         return " | ".join(context_parts)
     
     def check_available_data(self) -> str:
-        """Check what data is available for writing."""
-        available = []
-        
-        # Quick check for common memory keys
-        memory_check_keys = ['analysis_insights', 'research_synthesis', 'key_insights']
-        
-        for tool in self.tools:
-            if 'memory' in tool.name.lower() and 'read' in tool.name.lower():
-                for key in memory_check_keys:
-                    result = self.execute_tool(tool.name, key)
-                    if "No data found" not in result:
-                        available.append(key.replace('_', ' '))
-                break
-        
+        """Check what data is available for writing, re-reading memory only after one of the keys changed."""
+        return self.data_watch.cached(self.read_available_data)
+    
+    def read_available_data(self) -> str:
+        memory_keys = set(get_shared_memory().keys())
+        available = [key.replace('_', ' ') for key in self.data_watch.keys if key in memory_keys]
         return ", ".join(available) if available else "No data found"
     
     def compile_report(self, sections: List[str]) -> str:
@@ -194,16 +192,12 @@ class SwarmWriterAgent(BaseAgent):
         # If report is too short, we need to write actual content
         word_count = len(report.split())
         if word_count < (self.target_word_count * 0.8) and self.writing_phase == "drafting":
-            # Get available data
-            insights = ""
-            research = ""
-            outline = ""
-            for tool in self.tools:
-                if 'memory' in tool.name.lower() and 'read' in tool.name.lower():
-                    insights = self.execute_tool(tool.name, 'analysis_insights')
-                    research = self.execute_tool(tool.name, 'research_synthesis')
-                    outline = self.execute_tool(tool.name, 'report_outline')
-                    break
+            # Get available data; only the start of research and insights goes into the prompt,
+            # so read just those characters rather than the whole values
+            memory = get_shared_memory()
+            insights = memory.read_range('analysis_insights', 0, 1000) or ""
+            research = memory.read_range('research_synthesis', 0, 1000) or ""
+            outline = memory.get('report_outline', "")
             
             # Calculate dynamic word distribution
             # Structure: Abstract + Intro + (dynamic body sections) + Conclusion
@@ -250,8 +244,8 @@ class SwarmWriterAgent(BaseAgent):
             Total target: {self.target_word_count} words minimum
             
             Available data:
-            Research: {research[:1000]}...
-            Analysis: {insights[:1000]}...
+            Research: {research}...
+            Analysis: {insights}...
             
             IMPORTANT: Write ACTUAL CONTENT with facts, data, and insights.
             Do NOT just provide an outline or structure!
@@ -374,7 +368,11 @@ class SwarmWriterAgent(BaseAgent):
         
         Provide a single number score (1-10)."""
         
-        response = self.generate_response([], assessment_prompt)
+        response = self.generate_routed(
+            'final_quality_assessment', [], assessment_prompt,
+            lambda answer: re.search(r'(\d+)', answer) is not None,
+            schema=SCORE_SCHEMA
+        )
         
         # Extract score
         try:
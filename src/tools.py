@@ -1,18 +1,122 @@
-from langchain.tools import tool
-from langchain_community.tools import DuckDuckGoSearchRun
-from typing import Dict, Optional
+from langchain_core.tools import tool
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import contextvars
 import json
+import re
+import threading
+import time
+from typing import List, Tuple
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.cache import SearchCache, get_search_cache
+from src.search_backends import get_search_backend
+from src.shared_memory import get_shared_memory
 
-# Initialize search tool
-search = DuckDuckGoSearchRun()
+# Queries accepted per web_search_many call, and seconds each query may take
+SEARCH_MANY_MAX_QUERIES = int(os.getenv("SEARCH_MANY_MAX_QUERIES", "8"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "20"))
 
-@tool
-def web_search(query: str) -> str:
-    """Search the internet using DuckDuckGo."""
+# Searches run at once across all search_many calls in the process
+SEARCH_MANY_WORKERS = int(os.getenv("SEARCH_MANY_WORKERS", "16"))
+
+_search_executor = None
+_search_executor_lock = threading.Lock()
+
+def get_search_executor() -> ThreadPoolExecutor:
+    """Shared, bounded pool running the queries of search_many calls."""
+    global _search_executor
+    with _search_executor_lock:
+        if _search_executor is None:
+            _search_executor = ThreadPoolExecutor(max_workers=SEARCH_MANY_WORKERS, thread_name_prefix="search")
+        return _search_executor
+
+def search(query: str) -> str:
+    """Run one web search on the configured backend, answering from the search cache when possible."""
+    backend = get_search_backend()
+    cache = get_search_cache() if backend.cacheable else None
+    if cache:
+        cached = cache.get(query, source=backend.name)
+        if cached is not None:
+            return cached
+    
     try:
-        return search.invoke(query)
+        result = backend.search(query)
     except Exception as e:
         return f"Search error: {str(e)}"
+    
+    if cache:
+        cache.put(query, result, source=backend.name)
+    return result
+
+def _timed_search(query: str, started: threading.Event, start_time: List[float]) -> str:
+    """Run search(query), recording when a worker picked it up."""
+    start_time.append(time.monotonic())
+    started.set()
+    return search(query)
+
+def search_many(queries: List[str], timeout: float = SEARCH_TIMEOUT) -> List[Tuple[str, str]]:
+    """
+    Run several web searches concurrently on the shared search pool.
+    
+    Queries that differ only in case or whitespace are searched once. Each
+    query gets timeout seconds from the moment a worker starts it; a query
+    still running then is reported as timed out, completes in the background
+    and still fills the cache. A query that waits more than timeout seconds
+    for a free worker is cancelled and reported as such.
+    
+    Args:
+        queries: Search queries
+        timeout: Seconds each query may take once started, and may wait for a worker
+        
+    Returns:
+        One (query, result) pair per input query, in input order
+    """
+    distinct = {}
+    for query in queries:
+        distinct.setdefault(SearchCache.normalize_query(query), query)
+    
+    executor = get_search_executor()
+    jobs = {}
+    for key, query in distinct.items():
+        started, start_time = threading.Event(), []
+        future = executor.submit(contextvars.copy_context().run, _timed_search, query, started, start_time)
+        jobs[key] = (future, started, start_time)
+    
+    results = {}
+    queued_until = time.monotonic() + timeout
+    for key, (future, started, start_time) in jobs.items():
+        if not started.wait(max(queued_until - time.monotonic(), 0)) and future.cancel():
+            results[key] = f"Search error: no search worker free within {timeout:g}s"
+            continue
+        # Cancelling fails only once a worker has the query, so its start time is about to be set
+        started.wait()
+        try:
+            results[key] = future.result(timeout=max(start_time[0] + timeout - time.monotonic(), 0))
+        except FutureTimeoutError:
+            results[key] = f"Search error: timed out after {timeout:g}s"
+    return [(query, results[SearchCache.normalize_query(query)]) for query in queries]
+
+def split_search_results(text: str) -> List[Tuple[str, str]]:
+    """Split web_search_many output back into (query, result) pairs."""
+    return [(match.group(1).strip(), match.group(2).strip())
+            for match in re.finditer(r'^### Query: (.*)\n([\s\S]*?)(?=\n\n### Query: |\Z)', text, re.MULTILINE)]
+
+@tool
+def web_search(query: str) -> str:
+    """Search the internet."""
+    return search(query)
+
+@tool
+def web_search_many(queries: str) -> str:
+    """Run several web searches at once and return the results grouped by query. Format: queries separated by ';' or newlines, e.g. 'solar costs 2024; wind capacity growth'"""
+    query_list = [query.strip() for query in re.split(r'[;\n]', queries) if query.strip()]
+    if not query_list:
+        return "Error: Input must be one or more queries separated by ';'"
+    if len(query_list) > SEARCH_MANY_MAX_QUERIES:
+        return f"Error: At most {SEARCH_MANY_MAX_QUERIES} queries per call"
+    
+    return "\n\n".join(f"### Query: {query}\n{result}" for query, result in search_many(query_list))
 
 @tool
 def calculator(expression: str) -> str:
@@ -33,39 +137,62 @@ def save_to_memory(input: str) -> str:
         key, value = input.split('::', 1)
     except ValueError:
         return "Error: Input must be in format 'key::value'"
-    try:
-        with open('shared_memory.json', 'r') as f:
-            memory = json.load(f)
-    except:
-        memory = {}
     
-    memory[key] = value
-    
-    with open('shared_memory.json', 'w') as f:
-        json.dump(memory, f)
+    get_shared_memory().set(key, value)
     
     return f"Saved {key} to memory"
 
 @tool
 def read_from_memory(key: str) -> str:
     """Read information from shared memory."""
+    return get_shared_memory().get(key, f"No data found for key: {key}")
+
+@tool
+def save_many(input: str) -> str:
+    """Save several entries to shared memory in one write. Format: a JSON object mapping keys to values, e.g. '{"key1": "value1", "key2": "value2"}'"""
     try:
-        with open('shared_memory.json', 'r') as f:
-            memory = json.load(f)
-        return memory.get(key, f"No data found for key: {key}")
-    except:
-        return "Memory is empty"
+        items = json.loads(input)
+    except ValueError:
+        return "Error: Input must be a JSON object mapping keys to values"
+    if not isinstance(items, dict) or not items:
+        return "Error: Input must be a JSON object mapping keys to values"
+    
+    get_shared_memory().set_many({str(key): value if isinstance(value, str) else json.dumps(value)
+                                  for key, value in items.items()})
+    
+    return f"Saved {', '.join(items)} to memory"
+
+@tool
+def read_many(keys: str) -> str:
+    """Read several entries from shared memory in one read. Format: comma-separated keys, e.g. 'key1, key2'"""
+    key_list = [key.strip() for key in keys.split(',') if key.strip()]
+    if not key_list:
+        return "Error: Input must be comma-separated keys"
+    
+    values = get_shared_memory().get_many(key_list)
+    return "\n\n".join(f"[{key}]\n{values.get(key, f'No data found for key: {key}')}" for key in key_list)
+
+@tool
+def search_memory(query: str) -> str:
+    """Find the passages in shared memory most relevant to a query, best first. Format: 'query' or 'query::k' to return k passages (default 5)"""
+    k = 5
+    if '::' in query:
+        query, count = query.rsplit('::', 1)
+        try:
+            k = max(int(count), 1)
+        except ValueError:
+            return "Error: k must be a number, e.g. 'solar costs::3'"
+    
+    results = get_shared_memory().search(query, k)
+    if not results:
+        return f"No passages found for: {query}"
+    return "\n\n".join(f"[{key}] {passage}" for key, passage, _ in results)
 
 @tool
 def list_memory_keys() -> str:
     """List all keys in shared memory."""
-    try:
-        with open('shared_memory.json', 'r') as f:
-            memory = json.load(f)
-        keys = list(memory.keys())
-        return f"Memory keys: {', '.join(keys)}" if keys else "Memory is empty"
-    except:
-        return "Memory is empty"
+    keys = get_shared_memory().keys()
+    return f"Memory keys: {', '.join(keys)}" if keys else "Memory is empty"
 
 @tool
 def extract_facts(text: str) -> str:
@@ -149,18 +276,29 @@ def format_citation(source: str) -> str:
         pass
     return f"Source: {source}"
 
+# Tools whose results are data read back from shared memory
+MEMORY_READ_TOOLS = {"read_from_memory", "read_many", "search_memory"}
+
+# Tools without side effects or external calls, so a streamed plan may start them before it is final
+READ_ONLY_TOOLS = MEMORY_READ_TOOLS | {"list_memory_keys", "calculator", "extract_facts", "word_count",
+                                      "check_factual_consistency", "create_outline", "format_citation"}
+
 # Tool collections for different agent types
-RESEARCH_TOOLS = [web_search, save_to_memory, extract_facts, format_citation, create_outline, read_from_memory, list_memory_keys]
-ANALYSIS_TOOLS = [calculator, read_from_memory, save_to_memory, list_memory_keys, extract_facts, check_factual_consistency]
-WRITER_TOOLS = [read_from_memory, save_to_memory, list_memory_keys, word_count, create_outline]
-ORCHESTRATOR_TOOLS = [read_from_memory, list_memory_keys]
+RESEARCH_TOOLS = [web_search, web_search_many, save_to_memory, save_many, extract_facts, format_citation, create_outline, read_from_memory, read_many, search_memory, list_memory_keys]
+ANALYSIS_TOOLS = [calculator, read_from_memory, read_many, search_memory, save_to_memory, save_many, list_memory_keys, extract_facts, check_factual_consistency]
+WRITER_TOOLS = [read_from_memory, read_many, search_memory, save_to_memory, save_many, list_memory_keys, word_count, create_outline]
+ORCHESTRATOR_TOOLS = [read_from_memory, read_many, search_memory, list_memory_keys]
 
 # All tools available
 ALL_TOOLS = [
     web_search,
+    web_search_many,
     calculator,
     save_to_memory,
+    save_many,
     read_from_memory,
+    read_many,
+    search_memory,
     list_memory_keys,
     extract_facts,
     word_count,
@@ -0,0 +1,175 @@
+import asyncio
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+# The ledger for the run executing in the current context, and where in the graph we are.
+# Graph nodes set these (see track_node); BaseAgent reads them when it records a call.
+_current_ledger: contextvars.ContextVar = contextvars.ContextVar("usage_ledger", default=None)
+_current_node: contextvars.ContextVar = contextvars.ContextVar("usage_node", default=None)
+_current_iteration: contextvars.ContextVar = contextvars.ContextVar("usage_iteration", default=None)
+
+
+class UsageLedger:
+    """
+    Per-run record of every model call: tokens, latency and queue wait.
+
+    Each call is attributed to the agent that made it and to the graph node and
+    iteration it ran in, so runs of the orchestrator and swarm teams can be
+    compared on cost and latency rather than call counts alone.
+    """
+
+    def __init__(self, team_type: str = "", task: str = ""):
+        self.team_type = team_type
+        self.task = task
+        self.started_at = time.time()
+        self.calls: List[Dict[str, Any]] = []
+        self.events: Dict[str, int] = defaultdict(int)  # e.g. structured output parse failures
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, model: str, input_tokens: int, output_tokens: int,
+               latency: float, queue_wait: float = 0.0, attempts: int = 1,
+               cached: bool = False, error: Optional[str] = None, cached_input_tokens: int = 0, **extra):
+        """
+        Record one model call in the current node/iteration.
+
+        Args:
+            agent: Name of the calling agent
+            model: Model the call was sent to
+            input_tokens: Prompt tokens sent (and billed) in full
+            output_tokens: Completion tokens
+            latency: Wall-clock seconds spent in the call, excluding queue wait
+            queue_wait: Seconds spent waiting on the rate limiter
+            attempts: Attempts made, including retries
+            cached: True if the response was served from a cache without calling the model
+            error: Error type if the call ultimately failed
+            cached_input_tokens: Prompt tokens served from a provider-side prefix cache
+            **extra: Additional per-call fields to store
+        """
+        call = {
+            "timestamp": round(time.time() - self.started_at, 3),
+            "agent": agent,
+            "node": _current_node.get(),
+            "iteration": _current_iteration.get(),
+            "model": model,
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "output_tokens": output_tokens,
+            "latency": round(latency, 4),
+            "queue_wait": round(queue_wait, 4),
+            "attempts": attempts,
+            "cached": cached,
+            "error": error
+        }
+        call.update(extra)
+        with self._lock:
+            self.calls.append(call)
+
+    def count(self, event: str, n: int = 1):
+        """Count a run event that is not a model call, such as a parse failure or repair."""
+        with self._lock:
+            self.events[event] += n
+
+    @staticmethod
+    def _totals(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+        api_calls = [c for c in calls if not c["cached"]]
+        return {
+            "calls": len(calls),
+            "api_calls": len(api_calls),
+            "cached_calls": len(calls) - len(api_calls),
+            "failed_calls": len([c for c in calls if c["error"]]),
+            "input_tokens": sum(c["input_tokens"] for c in api_calls),
+            "cached_input_tokens": sum(c.get("cached_input_tokens", 0) for c in api_calls),
+            "output_tokens": sum(c["output_tokens"] for c in api_calls),
+            "latency": round(sum(c["latency"] for c in calls), 3),
+            "queue_wait": round(sum(c["queue_wait"] for c in calls), 3)
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Roll calls up into run totals and per-agent / per-node breakdowns."""
+        with self._lock:
+            calls = list(self.calls)
+            events = dict(self.events)
+
+        by_agent = defaultdict(list)
+        by_node = defaultdict(list)
+        for call in calls:
+            by_agent[call["agent"]].append(call)
+            by_node[call["node"] or "unknown"].append(call)
+
+        return {
+            "team": self.team_type,
+            "task": self.task,
+            "wall_time": round(time.time() - self.started_at, 3),
+            "totals": self._totals(calls),
+            "events": events,
+            "by_agent": {agent: self._totals(c) for agent, c in by_agent.items()},
+            "by_node": {node: self._totals(c) for node, c in by_node.items()}
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self.calls)
+        return {"summary": self.summary(), "calls": calls}
+
+    def save(self, filename: str) -> str:
+        """Write the ledger as JSON and return the filename."""
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return filename
+
+
+def current_ledger() -> Optional[UsageLedger]:
+    """Return the ledger of the run executing in this context, if any."""
+    return _current_ledger.get()
+
+
+def set_current_ledger(ledger: Optional[UsageLedger]):
+    """Make a ledger current for this context (and tasks/threads started from it)."""
+    _current_ledger.set(ledger)
+
+
+def track_node(node_name: str) -> Callable:
+    """
+    Decorate a graph node so model calls made inside it are attributed to it.
+
+    The node's state must carry the run's ledger under "ledger"; the node's
+    iteration is taken from "iteration_count". Works for sync and async nodes.
+    """
+    def decorator(func: Callable) -> Callable:
+        def enter(state: Dict[str, Any]) -> list:
+            return [
+                _current_ledger.set(state.get("ledger")),
+                _current_node.set(node_name),
+                _current_iteration.set(state.get("iteration_count"))
+            ]
+
+        def exit(tokens: list):
+            _current_iteration.reset(tokens[2])
+            _current_node.reset(tokens[1])
+            _current_ledger.reset(tokens[0])
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(state, *args, **kwargs):
+                tokens = enter(state)
+                try:
+                    return await func(state, *args, **kwargs)
+                finally:
+                    exit(tokens)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(state, *args, **kwargs):
+            tokens = enter(state)
+            try:
+                return func(state, *args, **kwargs)
+            finally:
+                exit(tokens)
+        return wrapper
+
+    return decorator